@@ -1,17 +1,5 @@
-import sqlite3
-import functools
-
-# Decorator to manage database connection
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
+# Decorator to manage database connection, shared by every module here
+from db_pool import with_db_connection
 
 
 @with_db_connection
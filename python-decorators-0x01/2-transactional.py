@@ -1,31 +1,61 @@
-import sqlite3
 import functools
 
-# Reuse with_db_connection decorator
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
+from cache import ANY_TABLE, invalidate_tables, tables_read, tables_written
+from db_pool import with_db_connection
+
+
+def has_triggers(conn, tables):
+    """True if a trigger fires on any of tables (its writes are untraced)"""
+    marks = ', '.join('?' * len(tables))
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' "
+        f"AND LOWER(tbl_name) IN ({marks}) LIMIT 1",
+        tuple(tables)).fetchone() is not None
+
+
+def with_views(conn, tables):
+    """tables plus every view reading them, directly or through views"""
+    views = [(name.lower(), tables_read(sql)) for name, sql in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'view'")]
+    tables = set(tables)
+    while True:
+        found = {name for name, reads in views
+                 if name not in tables and (reads & tables
+                                            or ANY_TABLE in reads)}
+        if not found:
+            return tables
+        tables |= found
 
 
 # Decorator for transaction management
+# Tables written inside the transaction are invalidated in every query
+# cache once it commits; a rollback leaves the caches alone. A write the
+# cache cannot attribute to a table (or one that fires a trigger)
+# invalidates everything. Cached reads of a view over a written table
+# are invalidated with it.
 def transactional(func):
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        written = set()
+        conn.set_trace_callback(
+            lambda statement: written.update(tables_written(statement)))
         try:
             result = func(conn, *args, **kwargs)
             conn.commit()
-            return result
         except Exception as e:
             conn.rollback()
             print(f"Transaction failed: {e}")
             raise
+        finally:
+            conn.set_trace_callback(None)
+        if written and ANY_TABLE not in written:
+            if has_triggers(conn, written):
+                written = {ANY_TABLE}
+            else:
+                written = with_views(conn, written)
+        if written:
+            invalidate_tables(written)
+        return result
     return wrapper
 
 
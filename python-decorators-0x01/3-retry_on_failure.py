@@ -1,19 +1,7 @@
 import time
-import sqlite3
 import functools
 
-# Reuse with_db_connection decorator
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
-
+from db_pool import with_db_connection
 
 # Retry decorator
 def retry_on_failure(retries=3, delay=2):
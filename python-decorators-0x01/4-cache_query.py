@@ -1,40 +1,71 @@
-import sqlite3
 import functools
+import inspect
 
-# Global query cache
-query_cache = {}
-
-# Reuse with_db_connection decorator
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
-
-
-# Cache decorator
-def cache_query(func):
-    @functools.wraps(func)
-    def wrapper(conn, query, *args, **kwargs):
-        if query in query_cache:
-            print("Using cached result for query:", query)
-            return query_cache[query]
-        result = func(conn, query, *args, **kwargs)
-        query_cache[query] = result
-        return result
-    return wrapper
+from cache import QueryCache, tables_read
+from db_pool import with_db_connection
+
+# Global query cache: LRU, bounded by entries and bytes, 5 minute TTL.
+# Pass disk=DiskCache('query_cache.db') (from disk_cache) to share
+# results with the other processes on this host.
+query_cache = QueryCache(max_entries=1024, max_bytes=64 * 1024 * 1024,
+                         ttl=300)
+
+
+def _freeze(value):
+    """Hashable form of a query parameter"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def cache_key(query, args, kwargs):
+    return (query, _freeze(args), _freeze(kwargs))
+
+
+# Cache decorator, usable bare or as cache_query(ttl=..., cache=...)
+# Results are tagged with the tables the query reads, so a transactional
+# commit that writes one of them drops the entry. Concurrent misses on
+# the same query run it once; coroutine functions are supported too.
+def cache_query(func=None, *, ttl=None, cache=None):
+    def decorator(func):
+        store = query_cache if cache is None else cache
+        options = {} if ttl is None else {'ttl': ttl}
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(conn, query, *args, **kwargs):
+                result, loaded = await store.aget_or_load(
+                    cache_key(query, args, kwargs),
+                    lambda: func(conn, query, *args, **kwargs),
+                    tables=tables_read(query), **options)
+                if not loaded:
+                    print("Using cached result for query:", query)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(conn, query, *args, **kwargs):
+            result, loaded = store.get_or_load(
+                cache_key(query, args, kwargs),
+                lambda: func(conn, query, *args, **kwargs),
+                tables=tables_read(query), **options)
+            if not loaded:
+                print("Using cached result for query:", query)
+            return result
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
 
 
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
 
@@ -0,0 +1,507 @@
+import asyncio
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from disk_cache import digest
+
+_MISSING = object()
+
+# Tag for results whose tables could not be parsed: any write drops
+# them. As a written table it means "could not tell": drop everything.
+ANY_TABLE = '*'
+
+_PART = r'[`"\[]?\w+[`"\]]?'
+_NAME = r'((?:' + _PART + r'\.)*' + _PART + ')'
+_READ_RE = re.compile(r'\b(?:FROM|JOIN)\s+', re.IGNORECASE)
+_TABLE_RE = re.compile(_NAME, re.IGNORECASE)
+_ALIAS_RE = re.compile(r'\s*(?:AS\s+)?(\w+)', re.IGNORECASE)
+_COMMA_RE = re.compile(r'\s*,\s*')
+_TOKEN_RE = re.compile(r"\s*(?:'(?:[^']|'')*'|(\w+)|\S)")
+_WRITE_RE = re.compile(
+    r'\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO'
+    r'|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM'
+    r'|DROP\s+TABLE(?:\s+IF\s+EXISTS)?|ALTER\s+TABLE)\s+' + _NAME,
+    re.IGNORECASE)
+_COMMENT_RE = re.compile(r'^\s*(?:--[^\n]*(?:\n|$)\s*|/\*.*?\*/\s*)*',
+                         re.DOTALL)
+# Statements that never change table contents
+_READ_ONLY = {'select', 'begin', 'commit', 'rollback', 'end', 'savepoint',
+              'release', 'explain'}
+# Words that can follow a table name and so are not its alias
+_CLAUSES = {'where', 'join', 'inner', 'left', 'right', 'full', 'outer',
+            'cross', 'natural', 'on', 'using', 'group', 'order', 'having',
+            'limit', 'union', 'intersect', 'except', 'window', 'set',
+            'values', 'as'}
+
+# Words that end a join's ON/USING condition
+_CONDITION_END = _CLAUSES - {'on', 'using', 'as', 'outer'}
+
+# Every live QueryCache, so a commit can invalidate all of them
+_caches = weakref.WeakSet()
+
+
+def _table(name):
+    return name.rsplit('.', 1)[-1].strip('`"[]').lower()
+
+
+def _skip_parens(sql, position):
+    """Index just past the parenthesis group opening at `position`"""
+    depth = 0
+    for index in range(position, len(sql)):
+        if sql[index] == '(':
+            depth += 1
+        elif sql[index] == ')':
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return len(sql)
+
+
+def _skip_condition(sql, position):
+    """Index of the comma or clause that ends an ON/USING condition"""
+    while position < len(sql):
+        token = _TOKEN_RE.match(sql, position)
+        if token is None:
+            break
+        text = token.group().lstrip()
+        start = token.end() - len(text)
+        if text == '(':
+            position = _skip_parens(sql, start)
+            continue
+        if text == ',' or (token.group(1) is not None
+                           and token.group(1).lower() in _CONDITION_END):
+            return start
+        position = token.end()
+    return len(sql)
+
+
+def tables_read(sql):
+    """Tables a SELECT reads, from its FROM lists and JOIN clauses"""
+    tables = set()
+    for clause in _READ_RE.finditer(sql):
+        position = clause.end()
+        # FROM a x, (SELECT ...) AS y, b JOIN c USING (id), d ... : read
+        # on while comma-led; subqueries are skipped here and found by
+        # their own FROM, joined tables by their JOIN
+        while True:
+            if sql.startswith('(', position):
+                position = _skip_parens(sql, position)
+            else:
+                match = _TABLE_RE.match(sql, position)
+                if match is None:
+                    break
+                tables.add(_table(match.group(1)))
+                position = match.end()
+            alias = _ALIAS_RE.match(sql, position)
+            if alias is not None and alias.group(1).lower() not in _CLAUSES:
+                position = alias.end()
+            word = _ALIAS_RE.match(sql, position)
+            if word is not None and word.group(1).lower() in ('on', 'using'):
+                position = _skip_condition(sql, word.end())
+            comma = _COMMA_RE.match(sql, position)
+            if comma is None:
+                break
+            position = comma.end()
+    return frozenset(tables) or frozenset([ANY_TABLE])
+
+
+def tables_written(sql):
+    """Tables a statement may change: empty for reads, and {ANY_TABLE}
+    for a write whose target cannot be parsed"""
+    statement = _COMMENT_RE.sub('', sql, count=1)
+    verb = statement.split(None, 1)[0].lower() if statement.strip() else ''
+    if verb in _READ_ONLY or not verb:
+        return set()
+    if verb == 'with':
+        # WITH ... SELECT reads; WITH ... INSERT/UPDATE/DELETE writes
+        match = _WRITE_RE.search(statement)
+        if match is None and not re.search(
+                r'\b(?:INSERT|UPDATE|DELETE|REPLACE)\b', statement,
+                re.IGNORECASE):
+            return set()
+    else:
+        match = _WRITE_RE.match(statement)
+    return {_table(match.group(1))} if match else {ANY_TABLE}
+
+
+def invalidate_tables(tables):
+    """Drops entries that read any of `tables` from every QueryCache"""
+    for cache in list(_caches):
+        cache.invalidate_tables(tables)
+
+
+def approx_size(value):
+    """Rough in-memory size of a query result (rows of plain values)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for row in value:
+            size += sys.getsizeof(row)
+            if isinstance(row, (list, tuple)):
+                size += sum(sys.getsizeof(item) for item in row)
+    return size
+
+
+class _Flight:
+    """One in-progress load of a key that other callers wait on"""
+
+    def __init__(self, tables, position=None):
+        self.tables = tables
+        self.position = position  # disk invalidation log id at start
+        self.stale = False  # invalidated while loading: don't store
+        self.future = None  # asyncio task running a coroutine load
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QueryCache:
+    """LRU cache of query results, bounded by entry count and bytes.
+
+    Entries expire after `ttl` seconds (None = never); set() can give an
+    entry its own ttl. stats() reports hits, misses and evictions.
+
+    The cache is thread-safe. get_or_load() and aget_or_load() coalesce
+    concurrent misses on a key into one load whose result (or
+    exception) every waiter shares; a load that was invalidated while
+    running is returned but not stored.
+
+    With `disk` (a disk_cache.DiskCache) misses fall through to a store
+    shared by every process on the host, writes and invalidations go to
+    both tiers, and invalidations logged by other processes are applied
+    here at most `sync_interval` seconds later.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024,
+                 ttl=None, sizeof=approx_size, disk=None, sync_interval=1.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        # key -> (value, size, expires_at, tables)
+        self._entries = OrderedDict()
+        self._by_table = {}  # table -> keys of entries that read it
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._flights = {}  # key -> _Flight
+        self._async_flights = {}  # (event loop, key) -> _Flight
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        self.disk = disk
+        self.disk_hits = 0
+        self.sync_interval = sync_interval
+        self._synced_at = time.monotonic()
+        self._log_position = disk.position() if disk is not None else None
+        # Bumped by every local invalidation; a disk read only promotes
+        # into memory if nothing was invalidated while it ran
+        self._generation = 0
+        _caches.add(self)
+
+    # Disk tier I/O never runs under self._lock: a busy shared file must
+    # not hold up memory hits in other threads.
+    def get(self, key, default=None):
+        self._sync()
+        with self._lock:
+            value = self._peek(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            if self.disk is None:
+                self.misses += 1
+                return default
+            generation = self._generation
+        found = self.disk.get(key)
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return default
+            value, ttl, tables = found
+            if generation == self._generation:
+                self._set_local(key, value, ttl, tables)
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+
+    def _peek(self, key):
+        """Memory-tier value for key, or _MISSING; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, _, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=_MISSING, tables=(ANY_TABLE,)):
+        """Caches value; `tables` are the tables it was read from"""
+        return self._set(key, value, ttl, tables)
+
+    def _set(self, key, value, ttl, tables, position=None, flight=None):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        tables = frozenset(tables)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl, tables, since=position)
+        with self._lock:
+            if flight is not None and flight.stale:
+                return False
+            return self._set_local(key, value, ttl, tables)
+
+    def _set_local(self, key, value, ttl, tables):
+        size = self.sizeof(value)
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (value, size, expires_at, tables)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            self._bytes += size
+            self._evict()
+            return True
+
+    def get_or_load(self, key, load, ttl=_MISSING, tables=(ANY_TABLE,)):
+        """Returns (value, loaded): the cached value, or load()'s result.
+
+        Concurrent callers missing on the same key wait for a single
+        load() call; `loaded` is True only for the caller that ran it.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value, False
+        with self._lock:
+            # Another caller may have loaded it since our miss
+            value = self._peek(key)
+            if value is not _MISSING:
+                return value, False
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(frozenset(tables))
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, False
+        try:
+            flight.position = self._position()
+            flight.result = load()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            self._land(key, flight, ttl)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, True
+
+    async def aget_or_load(self, key, load, ttl=_MISSING,
+                           tables=(ANY_TABLE,)):
+        """Coroutine get_or_load(); `load` is a coroutine function.
+
+        The load runs in its own task that every caller awaits through
+        shield(): cancelling a caller leaves the load and the other
+        callers alone. load() may use what the caller that started it
+        lent it, such as a pooled connection, so that caller's
+        cancellation only takes effect once the load has finished.
+        """
+        loop = asyncio.get_running_loop()
+        value = await self._off_loop(loop, self.get, key, _MISSING)
+        if value is not _MISSING:
+            return value, False
+        with self._lock:
+            value = self._peek(key)
+            if value is not _MISSING:
+                return value, False
+            flight = self._async_flights.get((loop, key))
+            leader = flight is None
+            if leader:
+                flight = _Flight(frozenset(tables))
+                flight.future = loop.create_task(
+                    self._aload(key, flight, load, ttl, loop))
+                self._async_flights[(loop, key)] = flight
+                # Mark an exception nobody waited for as retrieved
+                flight.future.add_done_callback(
+                    lambda f: f.cancelled() or f.exception())
+            else:
+                self.coalesced += 1
+        if not leader:
+            return await asyncio.shield(flight.future), False
+        try:
+            return await asyncio.shield(flight.future), True
+        except asyncio.CancelledError:
+            while not flight.future.done():
+                try:
+                    await asyncio.wait([flight.future])
+                except asyncio.CancelledError:
+                    pass
+            raise
+
+    async def _aload(self, key, flight, load, ttl, loop):
+        try:
+            flight.position = await self._off_loop(loop, self._position)
+            flight.result = await load()
+            await self._off_loop(loop, self._land, key, flight, ttl)
+            return flight.result
+        finally:
+            with self._lock:
+                del self._async_flights[(loop, key)]
+
+    async def _off_loop(self, loop, function, *args):
+        """Runs a call that may touch the disk tier off the event loop"""
+        if self.disk is None:
+            return function(*args)
+        return await loop.run_in_executor(None, function, *args)
+
+    def _land(self, key, flight, ttl):
+        # The disk tier rejects it itself if invalidated since `position`
+        if not flight.stale:
+            self._set(key, flight.result, ttl, flight.tables,
+                      flight.position, flight)
+
+    def _position(self):
+        return self.disk.position() if self.disk is not None else None
+
+    def _sync(self):
+        """Applies invalidations other processes logged on the disk tier"""
+        if self.disk is None:
+            return
+        with self._lock:
+            if time.monotonic() - self._synced_at < self.sync_interval:
+                return
+            self._synced_at = time.monotonic()
+            position = self._log_position
+        changes, new_position, complete = self.disk.changes_since(position)
+        with self._lock:
+            if self._log_position != position:
+                return  # another thread applied a newer batch
+            self._log_position = new_position
+            if not complete:
+                self._clear_local()
+                return
+            for kind, name in changes:
+                if kind == 'all':
+                    self._clear_local()
+                elif kind == 'table':
+                    self._invalidate_tables_local([name])
+                else:
+                    for key in [k for k in self._entries
+                                if digest(k) == name]:
+                        self._invalidate_local(key)
+
+    def _pending(self):
+        return list(self._flights.items()) + [
+            (key, flight) for (_, key), flight in self._async_flights.items()]
+
+    def _remove(self, key):
+        _, size, _, tables = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table[table]
+            keys.discard(key)
+            if not keys:
+                del self._by_table[table]
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, key):
+        if self.disk is not None:
+            self.disk.invalidate(key)
+        self._invalidate_local(key)
+
+    def _invalidate_local(self, key):
+        with self._lock:
+            self._generation += 1
+            for flight_key, flight in self._pending():
+                if flight_key == key:
+                    flight.stale = True
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tables(self, tables):
+        """Drops entries that read any of `tables`; returns how many"""
+        tables = {_table(table) for table in tables}
+        if self.disk is not None:
+            self.disk.invalidate_tables(tables)
+        return self._invalidate_tables_local(tables)
+
+    def _invalidate_tables_local(self, tables):
+        tables = set(tables)
+        with self._lock:
+            self._generation += 1
+            if ANY_TABLE in tables:
+                # A write we could not attribute: drop everything
+                keys = set(self._entries)
+                for _, flight in self._pending():
+                    flight.stale = True
+            else:
+                tables.add(ANY_TABLE)
+                for _, flight in self._pending():
+                    if flight.tables & tables:
+                        flight.stale = True
+                keys = set()
+                for table in tables:
+                    keys.update(self._by_table.get(table, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        if self.disk is not None:
+            self.disk.clear()
+        self._clear_local()
+
+    def _clear_local(self):
+        with self._lock:
+            self._generation += 1
+            for _, flight in self._pending():
+                flight.stale = True
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[2] is None
+                                          or entry[2] > time.monotonic())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'disk_hits': self.disk_hits,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'in_flight': len(self._flights) + len(self._async_flights),
+            }
@@ -0,0 +1,198 @@
+import asyncio
+import functools
+import inspect
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """Thread-safe pool of sqlite3 connections to one database.
+
+    Reusing connections keeps SQLite's page and statement caches warm.
+    A returned connection is rolled back if it left a transaction open
+    and loses any trace callback or row factory it was given, so the
+    next borrower starts clean. stats() reports pool utilisation.
+    """
+
+    def __init__(self, database='users.db', size=5, timeout=30):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._in_use = 0
+        self._stats = {
+            'checkouts': 0,
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'max_in_use': 0,
+            'resets': 0,
+            'discarded': 0,
+        }
+
+    def _connect(self):
+        return sqlite3.connect(self.database, check_same_thread=False)
+
+    def acquire(self):
+        """Checks a connection out, waiting up to `timeout` seconds"""
+        started = time.monotonic()
+        waited = False
+        try:
+            conn = self._idle.get_nowait()
+            hit = True
+        except queue.Empty:
+            with self._lock:
+                can_open = self._open < self.size
+                if can_open:
+                    self._open += 1
+            if can_open:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._open -= 1
+                    raise
+                hit = False
+            else:
+                waited = True
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(
+                        "No pooled connection available after "
+                        f"{self.timeout}s") from None
+                hit = True
+
+        wait = time.monotonic() - started
+        with self._lock:
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            self._stats['hits' if hit else 'misses'] += 1
+            if waited:
+                self._stats['waits'] += 1
+            self._stats['wait_time'] += wait
+            self._stats['max_wait_time'] = max(
+                self._stats['max_wait_time'], wait)
+            self._stats['max_in_use'] = max(
+                self._stats['max_in_use'], self._in_use)
+        return conn
+
+    def release(self, conn):
+        """Returns a connection after resetting its transaction state"""
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+                with self._lock:
+                    self._stats['resets'] += 1
+            conn.set_trace_callback(None)
+            conn.row_factory = None
+        except sqlite3.Error:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            with self._lock:
+                self._open -= 1
+                self._stats['discarded'] += 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager form of acquire()/release()"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        """Snapshot of pool counters for sizing the pool under load"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open'] = self._open
+            stats['in_use'] = self._in_use
+        stats['idle'] = self._idle.qsize()
+        stats['size'] = self.size
+        stats['utilization'] = stats['in_use'] / self.size
+        if stats['checkouts']:
+            stats['hit_rate'] = stats['hits'] / stats['checkouts']
+            stats['avg_wait_time'] = stats['wait_time'] / stats['checkouts']
+        else:
+            stats['hit_rate'] = 0.0
+            stats['avg_wait_time'] = 0.0
+        return stats
+
+    def close(self):
+        """Closes every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._open -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure(**kwargs):
+    """Replaces the shared pool, e.g. configure(database='x.db', size=10)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(**kwargs)
+    return _pool
+
+
+def get_pool():
+    """Returns the shared pool, creating it with defaults on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+# Decorator that lends the function a pooled connection. A coroutine
+# function keeps it checked out until it finishes; waiting for a free
+# connection happens off the event loop.
+def with_db_connection(func):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            pool = get_pool()
+            checkout = asyncio.get_running_loop().run_in_executor(
+                None, pool.acquire)
+            try:
+                conn = await asyncio.shield(checkout)
+            except asyncio.CancelledError:
+                # The checkout still completes: hand that connection back
+                checkout.add_done_callback(
+                    lambda done: done.cancelled() or done.exception()
+                    or pool.release(done.result()))
+                raise
+            try:
+                return await func(conn, *args, **kwargs)
+            finally:
+                pool.release(conn)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with get_pool().connection() as conn:
+            return func(conn, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,313 @@
+import hashlib
+import io
+import marshal
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+# Value encodings: marshal is compact and fast for rows of plain values,
+# pickle covers the column types below
+MARSHAL = 0
+PICKLE = 1
+
+# The only classes a pickled value may reference. Any process on the
+# host can write the cache file, so loading must never be able to call
+# arbitrary code; values needing anything else are not stored on disk.
+SAFE_GLOBALS = frozenset([
+    ('builtins', 'bytearray'), ('builtins', 'complex'),
+    ('builtins', 'frozenset'), ('builtins', 'set'),
+    ('collections', 'OrderedDict'),
+    ('datetime', 'date'), ('datetime', 'datetime'), ('datetime', 'time'),
+    ('datetime', 'timedelta'), ('datetime', 'timezone'),
+    ('decimal', 'Decimal'),
+])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    format INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    tables TEXT NOT NULL,
+    expires_at REAL,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_stored_at ON entries (stored_at);
+CREATE TABLE IF NOT EXISTS entry_tables (
+    table_name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (table_name, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS invalidations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    name TEXT,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO usage VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+BEGIN
+    UPDATE usage SET bytes = bytes + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+BEGIN
+    UPDATE usage SET bytes = bytes - old.size;
+    DELETE FROM entry_tables WHERE key = old.key;
+END;
+"""
+
+
+def digest(key):
+    """Stable cross-process name for a cache key"""
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+class _SafeUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if (module, name) not in SAFE_GLOBALS:
+            raise pickle.UnpicklingError(
+                f"{module}.{name} is not allowed in a cached value")
+        return super().find_class(module, name)
+
+
+def dumps(value):
+    """(format, bytes) for value, or None if it cannot be stored"""
+    try:
+        return MARSHAL, marshal.dumps(value)
+    except ValueError:
+        pass
+    try:
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        loads(PICKLE, data)
+    except (pickle.PickleError, TypeError, AttributeError):
+        return None
+    return PICKLE, data
+
+
+def loads(fmt, data):
+    if fmt == MARSHAL:
+        return marshal.loads(data)
+    return _SafeUnpickler(io.BytesIO(data)).load()
+
+
+class DiskCache:
+    """SQLite-backed result store shared by every process on the host.
+
+    Used as the second tier of a QueryCache (QueryCache(disk=...)).
+    Entries carry the same wall-clock TTL and table tags as the memory
+    tier, and every invalidation is appended to a log that the memory
+    tiers of other processes replay (see changes_since). Log rows older
+    than `log_retention` seconds are pruned.
+    """
+
+    def __init__(self, path='query_cache.db', max_bytes=256 * 1024 * 1024,
+                 log_retention=86400, timeout=30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.log_retention = log_retention
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def _connection(self):
+        # Connections are not shared with forked children
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _write(self, work):
+        """Runs work(conn) inside one IMMEDIATE transaction"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    def get(self, key):
+        """Returns (value, ttl left or None, tables), or None on a miss"""
+        name = digest(key)
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, format, tables, expires_at FROM entries "
+                "WHERE key = ?", (name,)).fetchone()
+        now = time.time()
+        if row is None or (row[3] is not None and row[3] <= now):
+            self.misses += 1
+            return None
+        try:
+            value = loads(row[1], row[0])
+        except (EOFError, TypeError, ValueError, pickle.UnpicklingError):
+            # Written by an incompatible interpreter, or names a class
+            # outside SAFE_GLOBALS: drop it
+            self._write(lambda conn: conn.execute(
+                "DELETE FROM entries WHERE key = ?", (name,)))
+            self.misses += 1
+            return None
+        self.hits += 1
+        ttl = row[3] - now if row[3] is not None else None
+        return value, ttl, frozenset(row[2].split(','))
+
+    def set(self, key, value, ttl, tables, since=None):
+        """Stores value unless it was invalidated after log id `since`"""
+        name = digest(key)
+        encoded = dumps(value)
+        if encoded is None or len(encoded[1]) > self.max_bytes:
+            return False
+        fmt, data = encoded
+        tables = sorted(tables)
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+
+        def work(conn):
+            if since is not None and self._invalidated(conn, name, tables,
+                                                       since):
+                return False
+            conn.execute("DELETE FROM entries WHERE key = ?", (name,))
+            conn.execute(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, data, fmt, len(data), ','.join(tables), expires_at,
+                 now))
+            conn.executemany("INSERT INTO entry_tables VALUES (?, ?)",
+                             [(table, name) for table in tables])
+            self._evict(conn, now)
+            return True
+
+        stored = self._write(work)
+        if not stored:
+            self.skipped += 1
+        return stored
+
+    def _invalidated(self, conn, name, tables, since):
+        checks = ["kind = 'all'", "(kind = 'key' AND name = ?)"]
+        params = [since, name]
+        if '*' in tables:
+            checks.append("kind = 'table'")
+        else:
+            checks.append("(kind = 'table' AND name IN (%s))"
+                          % ','.join('?' * (len(tables) + 1)))
+            params.extend(tables)
+            params.append('*')
+        return conn.execute(
+            "SELECT 1 FROM invalidations WHERE id > ? AND (%s) LIMIT 1"
+            % ' OR '.join(checks), params).fetchone() is not None
+
+    def _evict(self, conn, now):
+        used = conn.execute("SELECT bytes FROM usage").fetchone()[0]
+        if used <= self.max_bytes:
+            return
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        # Oldest first, a batch at a time, until back under budget
+        while conn.execute("SELECT bytes FROM usage").fetchone()[0] \
+                > self.max_bytes:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+                "ORDER BY stored_at LIMIT 64)")
+
+    def _log(self, conn, kind, names):
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO invalidations (kind, name, at) VALUES (?, ?, ?)",
+            [(kind, name, now) for name in names])
+        conn.execute("DELETE FROM invalidations WHERE at < ?",
+                     (now - self.log_retention,))
+
+    def invalidate(self, key):
+        name = digest(key)
+
+        def work(conn):
+            conn.execute("DELETE FROM entries WHERE key = ?", (name,))
+            self._log(conn, 'key', [name])
+        self._write(work)
+
+    def invalidate_tables(self, tables):
+        """Drops entries reading `tables`; '*' among them drops all"""
+        tables = sorted(set(tables))
+        tagged = sorted(set(tables) | {'*'})
+
+        def work(conn):
+            if '*' in tables:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM "
+                    "entry_tables WHERE table_name IN (%s))"
+                    % ','.join('?' * len(tagged)), tagged)
+            self._log(conn, 'table', tables)
+        self._write(work)
+
+    def clear(self):
+        def work(conn):
+            conn.execute("DELETE FROM entries")
+            self._log(conn, 'all', [None])
+        self._write(work)
+
+    def position(self):
+        """Id of the newest invalidation log row (0 if none)"""
+        with self._lock:
+            return self._last_id(self._connection())
+
+    def _last_id(self, conn):
+        # sqlite_sequence keeps counting after old rows are pruned
+        row = conn.execute("SELECT seq FROM sqlite_sequence "
+                           "WHERE name = 'invalidations'").fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, position):
+        """Returns ([(kind, name)], new position, complete)
+
+        complete is False if log rows after `position` were already
+        pruned, in which case the caller should drop everything it holds.
+        """
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT id, kind, name FROM invalidations WHERE id > ? "
+                "ORDER BY id", (position,)).fetchall()
+            last = self._last_id(conn)
+        if not rows:
+            return [], last, last == position
+        complete = rows[0][0] == position + 1
+        return [(kind, name) for _, kind, name in rows], rows[-1][0], complete
+
+    def stats(self):
+        with self._lock:
+            conn = self._connection()
+            entries = conn.execute(
+                "SELECT COUNT(*) FROM entries").fetchone()[0]
+            used = conn.execute("SELECT bytes FROM usage").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'bytes': used,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'skipped': self.skipped,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
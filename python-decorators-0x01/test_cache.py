@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Unit tests for cache.py module.
+Covers LRU/byte/TTL bounds, cache_query keying, table dependency
+parsing, write-aware invalidation and single-flight loading.
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from parameterized import parameterized
+
+import cache
+import db_pool
+from cache import ANY_TABLE, QueryCache
+
+transactional = __import__('2-transactional').transactional
+cache_query_module = __import__('4-cache_query')
+
+
+class TestQueryCache(unittest.TestCase):
+    """Test cases for QueryCache bounds and expiry."""
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry goes first."""
+        store = QueryCache(max_entries=2)
+        store.set('a', [1])
+        store.set('b', [2])
+        store.get('a')
+        store.set('c', [3])
+        self.assertEqual([key in store for key in 'abc'],
+                         [True, False, True])
+        self.assertEqual(store.stats()['evictions'], 1)
+
+    def test_byte_eviction(self):
+        """Test that entries are evicted to stay within max_bytes."""
+        store = QueryCache(max_bytes=100, sizeof=len)
+        store.set('a', 'x' * 40)
+        store.set('b', 'x' * 40)
+        store.set('c', 'x' * 40)
+        self.assertNotIn('a', store)
+        self.assertEqual(store.stats()['bytes'], 80)
+
+    def test_oversized_value_not_cached(self):
+        """Test that a value larger than max_bytes is refused."""
+        store = QueryCache(max_bytes=10, sizeof=len)
+        self.assertFalse(store.set('a', 'x' * 11))
+        self.assertEqual(len(store), 0)
+
+    def test_ttl(self):
+        """Test default and per-entry expiry."""
+        store = QueryCache(ttl=0.02)
+        store.set('short', [1])
+        store.set('forever', [2], ttl=None)
+        time.sleep(0.03)
+        self.assertIsNone(store.get('short'))
+        self.assertEqual(store.get('forever'), [2])
+        self.assertEqual(store.stats()['expirations'], 1)
+
+    def test_hit_and_miss_counts(self):
+        """Test that stats() counts lookups."""
+        store = QueryCache()
+        store.set('a', [1])
+        store.get('a')
+        store.get('b')
+        stats = store.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']),
+                         (1, 1, 0.5))
+
+
+class TestCacheQuery(unittest.TestCase):
+    """Test cases for the cache_query decorator."""
+
+    def setUp(self):
+        """Wraps a counting fake query function with its own cache."""
+        self.store = QueryCache()
+        self.calls = []
+
+        @cache_query_module.cache_query(cache=self.store)
+        def fetch(conn, query, params=()):
+            self.calls.append((query, params))
+            return [(query, params)]
+
+        self.fetch = fetch
+
+    def test_keys_on_parameters(self):
+        """Test that the same query with other parameters is not shared."""
+        query = "SELECT * FROM users WHERE id = ?"
+        self.fetch(None, query, (1,))
+        self.fetch(None, query, (1,))
+        self.fetch(None, query, (2,))
+        self.fetch(None, query, params=[2])
+        self.assertEqual(len(self.calls), 3)
+
+    def test_unhashable_parameters(self):
+        """Test that list and dict parameters can be part of the key."""
+        self.fetch(None, "SELECT 1 FROM users", {'ids': [1, 2]})
+        self.fetch(None, "SELECT 1 FROM users", {'ids': [1, 2]})
+        self.assertEqual(len(self.calls), 1)
+
+    def test_result_tagged_with_tables(self):
+        """Test that a write to a read table invalidates the result."""
+        self.fetch(None, "SELECT * FROM users u, orders o")
+        cache.invalidate_tables({'orders'})
+        self.fetch(None, "SELECT * FROM users u, orders o")
+        self.assertEqual(len(self.calls), 2)
+
+
+class TestTablesRead(unittest.TestCase):
+    """Test cases for the tables a cached query depends on."""
+
+    @parameterized.expand([
+        ("SELECT * FROM users", {'users'}),
+        ("SELECT * FROM users u, orders o WHERE u.id = o.user_id",
+         {'users', 'orders'}),
+        ("SELECT * FROM users AS u , main.\"Orders\" AS o JOIN items i ON 1",
+         {'users', 'orders', 'items'}),
+        ("SELECT * FROM (SELECT * FROM a) AS s, b", {'a', 'b'}),
+        ("SELECT a FROM t WHERE b IN (1, 2) ORDER BY a, b", {'t'}),
+        ("SELECT * FROM users u LEFT OUTER JOIN orders o USING(id), items",
+         {'users', 'orders', 'items'}),
+        ("SELECT * FROM a JOIN b ON a.id = b.id AND f(a.x, 1) > 0, c "
+         "WHERE a.n = ','", {'a', 'b', 'c'}),
+        ("SELECT 1", {ANY_TABLE}),
+    ])
+    def test_tables_read(self, sql, expected):
+        """Test that FROM lists, joins and subqueries are all picked up."""
+        self.assertEqual(cache.tables_read(sql), expected)
+
+
+class TestTablesWritten(unittest.TestCase):
+    """Test cases for the tables a traced statement writes."""
+
+    @parameterized.expand([
+        ("UPDATE users SET email = ? WHERE id = ?", {'users'}),
+        ("INSERT OR REPLACE INTO [users] VALUES (1)", {'users'}),
+        ("  /* note */ delete from main.users", {'users'}),
+        ("WITH c AS (SELECT 1) UPDATE orders SET n = 1", {'orders'}),
+        ("WITH c AS (SELECT id FROM a) SELECT * FROM c", set()),
+        ("SELECT * FROM users", set()),
+        ("BEGIN ", set()),
+        ("COMMIT", set()),
+        ("CREATE TABLE z (a)", {ANY_TABLE}),
+        ("VACUUM", {ANY_TABLE}),
+    ])
+    def test_tables_written(self, sql, expected):
+        """Test that writes it cannot attribute fail safe to ANY_TABLE."""
+        self.assertEqual(cache.tables_written(sql), expected)
+
+
+class TestTableInvalidation(unittest.TestCase):
+    """Test cases for invalidating cached entries by table."""
+
+    def setUp(self):
+        """Fills a cache with entries depending on different tables."""
+        self.cache = QueryCache()
+        self.cache.set('users', [1], tables=['users'])
+        self.cache.set('join', [2], tables=['users', 'orders'])
+        self.cache.set('orders', [3], tables=['orders'])
+        self.cache.set('unknown', [4], tables=[ANY_TABLE])
+
+    def test_only_dependents_dropped(self):
+        """Test that a write to one table keeps unrelated entries."""
+        self.assertEqual(self.cache.invalidate_tables({'Users'}), 3)
+        self.assertEqual([key for key in ('users', 'join', 'orders',
+                                          'unknown') if key in self.cache],
+                         ['orders'])
+
+    def test_any_table_drops_everything(self):
+        """Test that an unattributed write empties the cache."""
+        self.cache.invalidate_tables({ANY_TABLE})
+        self.assertEqual(len(self.cache), 0)
+
+    def test_module_level_reaches_every_cache(self):
+        """Test that cache.invalidate_tables covers all live caches."""
+        other = QueryCache()
+        other.set('users', [1], tables=['users'])
+        cache.invalidate_tables({'users'})
+        self.assertNotIn('users', other)
+        self.assertNotIn('users', self.cache)
+
+
+class TestTransactional(unittest.TestCase):
+    """Test cases for invalidation on transactional commits."""
+
+    def setUp(self):
+        """Creates a users/orders database and a cache over it."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.tmp.name, 'users.db'))
+        self.conn.executescript(
+            "CREATE TABLE users (id INTEGER, email TEXT);"
+            "CREATE TABLE orders (id INTEGER);"
+            "CREATE TABLE audit (id INTEGER);")
+        self.cache = QueryCache()
+        self.cache.set('users', [1], tables=['users'])
+        self.cache.set('orders', [2], tables=['orders'])
+
+    def tearDown(self):
+        """Closes and removes the database."""
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_commit_invalidates_written_table(self):
+        """Test that a commit drops only entries reading its tables."""
+        transactional(lambda conn: conn.execute(
+            "UPDATE users SET email = 'x'"))(self.conn)
+        self.assertNotIn('users', self.cache)
+        self.assertIn('orders', self.cache)
+
+    def test_rollback_keeps_entries(self):
+        """Test that a failed transaction invalidates nothing."""
+        def fail(conn):
+            conn.execute("UPDATE users SET email = 'x'")
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            transactional(fail)(self.conn)
+        self.assertIn('users', self.cache)
+
+    def test_view_invalidated_with_its_table(self):
+        """Test that a write drops cached reads of views over the table."""
+        self.conn.executescript(
+            "CREATE VIEW v AS SELECT * FROM users;"
+            "CREATE VIEW vv AS SELECT * FROM v;")
+        self.cache.set('view', [3], tables=cache.tables_read(
+            "SELECT * FROM vv"))
+        transactional(lambda conn: conn.execute(
+            "UPDATE users SET email = 'x'"))(self.conn)
+        self.assertNotIn('view', self.cache)
+        self.assertIn('orders', self.cache)
+
+    def test_trigger_invalidates_everything(self):
+        """Test that writes which fire triggers fail safe."""
+        self.conn.execute(
+            "CREATE TRIGGER audit_users AFTER UPDATE ON users "
+            "BEGIN INSERT INTO audit VALUES (new.id); END")
+        transactional(lambda conn: conn.execute(
+            "UPDATE users SET email = 'x'"))(self.conn)
+        self.assertEqual(len(self.cache), 0)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test cases for coalescing concurrent misses on one key."""
+
+    def setUp(self):
+        """Creates an empty cache."""
+        self.cache = QueryCache()
+
+    def _run_threads(self, load, count=8):
+        results = []
+
+        def call():
+            try:
+                results.append(self.cache.get_or_load('key', load))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_threads_share_one_load(self):
+        """Test that concurrent misses run the load once."""
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.1)
+            return [('row',)]
+
+        results = self._run_threads(load)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([value for value, _ in results], [[('row',)]] * 8)
+        self.assertEqual(sum(loaded for _, loaded in results), 1)
+        self.assertEqual(self.cache.get('key'), [('row',)])
+
+    def test_threads_share_exception(self):
+        """Test that every waiter sees the load's exception."""
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.1)
+            raise ValueError("boom")
+
+        results = self._run_threads(load)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(isinstance(e, ValueError) for e in results))
+        self.assertNotIn('key', self.cache)
+
+    def test_invalidated_load_not_stored(self):
+        """Test that a load invalidated mid-flight is returned, not kept."""
+        def load():
+            self.cache.invalidate_tables({'users'})
+            return [1]
+
+        value, loaded = self.cache.get_or_load('key', load,
+                                               tables=['users'])
+        self.assertEqual((value, loaded), ([1], True))
+        self.assertNotIn('key', self.cache)
+
+    def test_coroutines_share_one_load(self):
+        """Test that concurrent coroutine misses await a single load."""
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return [2]
+
+        async def main():
+            return await asyncio.gather(*[
+                self.cache.aget_or_load('key', load) for _ in range(5)])
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([value for value, _ in results], [[2]] * 5)
+        self.assertEqual(self.cache.get('key'), [2])
+
+    def test_cancelled_leader_leaves_waiters(self):
+        """Test that cancelling the caller that started the load does
+        not cancel the callers waiting on it."""
+        async def load():
+            await asyncio.sleep(0.05)
+            return [3]
+
+        async def main():
+            leader = asyncio.ensure_future(
+                self.cache.aget_or_load('key', load))
+            await asyncio.sleep(0)
+            waiters = [asyncio.ensure_future(
+                self.cache.aget_or_load('key', load)) for _ in range(2)]
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await asyncio.gather(leader, *waiters,
+                                        return_exceptions=True)
+
+        leader, *waiters = asyncio.run(main())
+        self.assertIsInstance(leader, asyncio.CancelledError)
+        self.assertEqual(waiters, [([3], False), ([3], False)])
+        self.assertEqual(self.cache.get('key'), [3])
+
+    def test_cancelled_leader_keeps_pooled_connection(self):
+        """Test that a cancelled leader keeps its pooled connection
+        checked out while the load it started still uses it."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        pool = db_pool.configure(
+            database=os.path.join(tmp.name, 'users.db'), size=1)
+        self.addCleanup(pool.close)
+        busy = set()
+        shared = []
+        started = asyncio.Event()
+
+        @db_pool.with_db_connection
+        @cache_query_module.cache_query(cache=self.cache)
+        async def fetch(conn, query):
+            busy.add(conn)
+            started.set()
+            await asyncio.sleep(0.05)
+            busy.discard(conn)
+            return conn.execute(query).fetchall()
+
+        @db_pool.with_db_connection
+        async def other(conn):
+            shared.append(conn in busy)
+
+        async def main():
+            leader = asyncio.ensure_future(fetch(query="SELECT 1"))
+            await started.wait()
+            leader.cancel()
+            await asyncio.gather(leader, other(), return_exceptions=True)
+            return leader
+
+        leader = asyncio.run(main())
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(shared, [False])
+        self.assertEqual(self.cache.get(cache_query_module.cache_key(
+            "SELECT 1", (), {})), [(1,)])
+        self.assertEqual(pool.stats()['in_use'], 0)
+
+    def test_coroutine_exception_shared(self):
+        """Test that coroutine waiters all receive the load's exception."""
+        async def load():
+            await asyncio.sleep(0.01)
+            raise KeyError("gone")
+
+        async def main():
+            return await asyncio.gather(*[
+                self.cache.aget_or_load('key', load) for _ in range(3)],
+                return_exceptions=True)
+
+        results = asyncio.run(main())
+        self.assertTrue(all(isinstance(e, KeyError) for e in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
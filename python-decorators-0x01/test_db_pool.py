@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Unit tests for db_pool.py module.
+Covers connection reuse, state reset and the with_db_connection decorator.
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+
+import db_pool
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test cases for ConnectionPool checkout and return."""
+
+    def setUp(self):
+        """Creates a users database and a shared pool over it."""
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, 'users.db')
+        self.pool = db_pool.configure(database=path, size=2, timeout=1)
+        with self.pool.connection() as conn:
+            conn.execute("CREATE TABLE users (id INTEGER, email TEXT)")
+            conn.execute("INSERT INTO users VALUES (1, 'a@b.c')")
+            conn.commit()
+
+    def tearDown(self):
+        """Closes the pool and removes the database."""
+        self.pool.close()
+        self.tmp.cleanup()
+
+    def test_connections_are_reused(self):
+        """Test that a returned connection serves the next checkout."""
+        first = self.pool.acquire()
+        self.pool.release(first)
+        second = self.pool.acquire()
+        self.pool.release(second)
+        self.assertIs(first, second)
+        self.assertEqual(self.pool.stats()['open'], 1)
+
+    def test_release_resets_state(self):
+        """Test that open transactions and callbacks do not leak."""
+        conn = self.pool.acquire()
+        conn.execute("UPDATE users SET email = 'x'")
+        conn.set_trace_callback(print)
+        self.pool.release(conn)
+        with self.pool.connection() as conn:
+            self.assertFalse(conn.in_transaction)
+            email = conn.execute("SELECT email FROM users").fetchone()[0]
+        self.assertEqual(email, 'a@b.c')
+        self.assertEqual(self.pool.stats()['resets'], 1)
+
+    def test_timeout_when_exhausted(self):
+        """Test that checkout gives up after `timeout` seconds."""
+        held = [self.pool.acquire(), self.pool.acquire()]
+        self.pool.timeout = 0.05
+        with self.assertRaises(TimeoutError):
+            self.pool.acquire()
+        for conn in held:
+            self.pool.release(conn)
+
+    def test_threads_share_pool(self):
+        """Test that concurrent callers never exceed the pool size."""
+        @db_pool.with_db_connection
+        def read(conn):
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+        threads = [threading.Thread(target=lambda: [read() for _ in
+                                                    range(50)])
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = self.pool.stats()
+        self.assertEqual(stats['checkouts'], 401)
+        self.assertLessEqual(stats['max_in_use'], 2)
+        self.assertEqual(stats['in_use'], 0)
+
+    def test_coroutine_keeps_connection(self):
+        """Test that an async function holds its connection until done."""
+        seen = []
+
+        @db_pool.with_db_connection
+        async def read(conn):
+            await asyncio.sleep(0)
+            seen.append(self.pool.stats()['in_use'])
+            return conn.execute("SELECT email FROM users").fetchone()[0]
+
+        self.assertEqual(asyncio.run(read()), 'a@b.c')
+        self.assertEqual(seen, [1])
+        self.assertEqual(self.pool.stats()['in_use'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Unit tests for disk_cache.py module.
+Covers the shared on-disk tier behind QueryCache.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+
+from cache import QueryCache
+from disk_cache import PICKLE, DiskCache
+
+
+def _invalidate_in_child(path, tables):
+    """Runs in another process: invalidates through its own QueryCache"""
+    QueryCache(disk=DiskCache(path)).invalidate_tables(tables)
+
+
+def _read_in_child(path, key, results):
+    """Runs in another process: reads a key through a cold QueryCache"""
+    results.put(QueryCache(disk=DiskCache(path)).get(key))
+
+
+class BlockingDisk:
+    """DiskCache stand-in whose reads and writes wait on an event."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.entered = threading.Event()
+
+    def _block(self):
+        self.entered.set()
+        self.release.wait(5)
+
+    def position(self):
+        return 0
+
+    def changes_since(self, position):
+        return [], position, True
+
+    def get(self, key):
+        self._block()
+        return None
+
+    def set(self, key, value, ttl, tables, since=None):
+        self._block()
+        return True
+
+
+class TestDiskTierLocking(unittest.TestCase):
+    """Test cases for disk I/O running outside the memory-tier lock."""
+
+    def _assert_memory_hit_not_blocked(self, slow_call):
+        disk = BlockingDisk()
+        cache = QueryCache(disk=disk)
+        cache._set_local('hot', [1], None, frozenset(['users']))
+        worker = threading.Thread(target=slow_call, args=(cache,))
+        worker.start()
+        try:
+            self.assertTrue(disk.entered.wait(5))
+            started = time.monotonic()
+            self.assertEqual(cache.get('hot'), [1])
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            disk.release.set()
+            worker.join()
+
+    def test_disk_read_does_not_block_hits(self):
+        """Test that a slow disk miss leaves memory hits running."""
+        self._assert_memory_hit_not_blocked(lambda cache: cache.get('cold'))
+
+    def test_disk_write_does_not_block_hits(self):
+        """Test that a slow disk store leaves memory hits running."""
+        self._assert_memory_hit_not_blocked(
+            lambda cache: cache.get_or_load('cold', lambda: [2]))
+
+    def test_coroutine_disk_io_off_loop(self):
+        """Test that aget_or_load keeps the event loop free while the
+        disk tier is busy."""
+        disk = BlockingDisk()
+        cache = QueryCache(disk=disk)
+
+        async def load():
+            return [3]
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            task = asyncio.ensure_future(cache.aget_or_load('cold', load))
+            started = time.monotonic()
+            entered = await loop.run_in_executor(None, disk.entered.wait, 5)
+            elapsed = time.monotonic() - started
+            disk.release.set()
+            return entered, elapsed, await task
+
+        entered, elapsed, result = asyncio.run(main())
+        self.assertTrue(entered)
+        self.assertLess(elapsed, 1)
+        self.assertEqual(result, ([3], True))
+
+
+class _Exploit:
+    def __reduce__(self):
+        return (os.getpid, ())
+
+
+class TestDiskCache(unittest.TestCase):
+    """Test cases for DiskCache storage and invalidation."""
+
+    def setUp(self):
+        """Creates a fresh cache file."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'query_cache.db')
+        self.disk = DiskCache(self.path)
+
+    def tearDown(self):
+        """Closes and removes the cache file."""
+        self.disk.close()
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        """Test that marshal and pickle values both come back intact."""
+        from decimal import Decimal
+        rows = [(1, 'a', 2.5, None)]
+        self.disk.set('rows', rows, None, {'users'})
+        self.disk.set('decimal', [Decimal('1.5')], None, {'users'})
+        self.assertEqual(self.disk.get('rows')[0], rows)
+        self.assertEqual(self.disk.get('decimal')[0], [Decimal('1.5')])
+
+    def test_round_trip_datetime(self):
+        """Test that date and time columns are stored and read back."""
+        import datetime
+        rows = [(datetime.datetime(2024, 1, 2, 3, 4, 5,
+                                   tzinfo=datetime.timezone.utc),
+                 datetime.date(2024, 1, 2))]
+        self.assertTrue(self.disk.set('rows', rows, None, {'users'}))
+        self.assertEqual(self.disk.get('rows')[0], rows)
+
+    def test_other_classes_not_stored(self):
+        """Test that values needing arbitrary classes stay off disk."""
+        self.assertFalse(self.disk.set('obj', [_Exploit()], None, {'t'}))
+        self.assertIsNone(self.disk.get('obj'))
+
+    def test_foreign_pickle_refused(self):
+        """Test that a pickle naming a callable is dropped, not run."""
+        self.disk.set('key', [1], None, {'users'})
+        self.disk._write(lambda conn: conn.execute(
+            "UPDATE entries SET value = ?, format = ?",
+            (pickle.dumps([_Exploit()]), PICKLE)))
+        self.assertIsNone(self.disk.get('key'))
+        self.assertEqual(self.disk.stats()['entries'], 0)
+
+    def test_ttl(self):
+        """Test that expired entries read as misses."""
+        self.disk.set('key', [1], 0.01, {'users'})
+        time.sleep(0.02)
+        self.assertIsNone(self.disk.get('key'))
+
+    def test_invalidate_tables(self):
+        """Test that only dependent entries go, unless '*' is given."""
+        self.disk.set('users', [1], None, {'users'})
+        self.disk.set('orders', [2], None, {'orders'})
+        self.disk.invalidate_tables({'users'})
+        self.assertIsNone(self.disk.get('users'))
+        self.assertIsNotNone(self.disk.get('orders'))
+        self.disk.invalidate_tables({'*'})
+        self.assertIsNone(self.disk.get('orders'))
+
+    def test_set_skipped_after_invalidation(self):
+        """Test that a load invalidated since `since` is not stored."""
+        since = self.disk.position()
+        self.disk.invalidate_tables({'users'})
+        self.assertFalse(self.disk.set('key', [1], None, {'users'}, since))
+        self.assertTrue(self.disk.set('key', [1], None, {'orders'}, since))
+
+    def test_byte_budget(self):
+        """Test that the oldest entries are evicted past max_bytes."""
+        disk = DiskCache(self.path, max_bytes=2000)
+        for index in range(50):
+            disk.set(index, list(range(20)), None, {'t'})
+        self.assertLessEqual(disk.stats()['bytes'], 2000)
+        self.assertIsNotNone(disk.get(49))
+        self.assertIsNone(disk.get(0))
+        disk.close()
+
+
+class TestCrossProcess(unittest.TestCase):
+    """Test cases for sharing the disk tier between processes."""
+
+    def setUp(self):
+        """Creates a cache file and a process context."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'query_cache.db')
+        self.context = multiprocessing.get_context('spawn')
+
+    def tearDown(self):
+        """Removes the cache file."""
+        self.tmp.cleanup()
+
+    def _run(self, target, *args):
+        process = self.context.Process(target=target, args=args)
+        process.start()
+        process.join(30)
+        self.assertEqual(process.exitcode, 0)
+
+    def test_other_process_reads_results(self):
+        """Test that a cold process is served from the shared file."""
+        QueryCache(disk=DiskCache(self.path)).set(
+            'key', [(1, 'a')], tables=['users'])
+        results = self.context.Queue()
+        self._run(_read_in_child, self.path, 'key', results)
+        self.assertEqual(results.get(timeout=5), [(1, 'a')])
+
+    def test_invalidation_replayed(self):
+        """Test that another process's invalidation reaches memory."""
+        store = QueryCache(disk=DiskCache(self.path), sync_interval=0)
+        store.set('users', [1], tables=['users'])
+        store.set('orders', [2], tables=['orders'])
+        self._run(_invalidate_in_child, self.path, {'users'})
+        self.assertIsNone(store.get('users'))
+        self.assertEqual(store.get('orders'), [2])
+        self.assertEqual(store.stats()['disk_hits'], 0)
+
+    def test_invalidation_waits_for_sync_interval(self):
+        """Test that replay happens at most every sync_interval."""
+        store = QueryCache(disk=DiskCache(self.path), sync_interval=60)
+        store.set('users', [1], tables=['users'])
+        self._run(_invalidate_in_child, self.path, {'users'})
+        self.assertEqual(store.get('users'), [1])
+        store._synced_at -= 60
+        self.assertIsNone(store.get('users'))
+
+
+if __name__ == '__main__':
+    unittest.main()
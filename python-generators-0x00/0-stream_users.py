@@ -1,17 +1,73 @@
 #!/usr/bin/python3
+import pool
 import seed
 
-def stream_users():
-    """Generator that yields one user row at a time from user_data table"""
-    connection = seed.connect_to_prodev()
-    if not connection:
-        return
+def stream_users(arraysize=1000, as_tuples=False):
+    """Generator that yields one user row at a time from user_data table
 
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data")
+    Rows are pulled from an unbuffered cursor `arraysize` at a time, so
+    memory is bounded by the chunk size rather than the table size.
+    as_tuples=True yields (user_id, name, email, age) tuples instead of
+    building a dict per row.
+    """
+    with pool.connection() as connection:
+        if not connection:
+            return
 
-    for row in cursor:
-        yield row
+        cursor = seed.open_cursor(connection, dictionary=not as_tuples)
+        cursor.execute("SELECT user_id, name, email, age FROM user_data")
 
-    cursor.close()
-    connection.close()
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                break
+            yield from rows
+
+        cursor.close()
+
+def stream_user_changes(since=None, arraysize=1000, lag=5.0):
+    """Generator that yields (row, watermark) for users changed after since
+
+    The watermark is the (updated_at, user_id) pair of the row just
+    yielded; persist the last one and pass it back as `since` on the next
+    poll to read only rows inserted or updated in the meantime. Deleted
+    rows are not reported.
+
+    updated_at is stamped when a row is written, not when its transaction
+    commits, so a slow transaction can commit rows older than a watermark
+    already handed out. Only rows stamped at least `lag` seconds before
+    the database's current time are returned; the rest wait for a later
+    poll. `lag` must exceed the longest write transaction against
+    user_data, or its rows can be skipped.
+    """
+    with pool.connection() as connection:
+        if not connection:
+            return
+
+        mark = seed.placeholder(connection)
+        if seed.is_sqlite(connection):
+            cutoff = f"strftime('%Y-%m-%d %H:%M:%f', 'now', {mark})"
+            params = [f"-{lag:f} seconds"]
+        else:
+            cutoff = f"CURRENT_TIMESTAMP(6) - INTERVAL {mark} MICROSECOND"
+            params = [round(lag * 1000000)]
+        query = ("SELECT user_id, name, email, age, updated_at FROM user_data"
+                 f" WHERE updated_at <= {cutoff}")
+        if since is not None:
+            updated_at, user_id = since
+            query += (f" AND (updated_at > {mark}"
+                      f" OR (updated_at = {mark} AND user_id > {mark}))")
+            params += [updated_at, updated_at, user_id]
+        query += " ORDER BY updated_at, user_id"
+
+        cursor = seed.open_cursor(connection)
+        cursor.execute(query, params)
+
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                break
+            for row in rows:
+                yield row, (row['updated_at'], row['user_id'])
+
+        cursor.close()
@@ -1,31 +1,236 @@
 #!/usr/bin/python3
+import json
+import os
+
+import pool
 import seed
+from columnar import ColumnarBatch
 
-def stream_users_in_batches(batch_size):
-    """Generator that yields users in batches from user_data table"""
-    connection = seed.connect_to_prodev()
-    if not connection:
-        return
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+
+def build_user_query(connection, columns=None, where=None):
+    """Builds the SELECT for user_data with projection and filter pushed down
+
+    `where` is an SQL condition using %s for bound parameters; it is
+    rewritten for the connection's driver.
+    """
+    columns = columns or USER_COLUMNS
+    unknown = [column for column in columns if column not in USER_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown user_data column(s): {', '.join(unknown)}")
+    query = f"SELECT {', '.join(columns)} FROM user_data"
+    if where:
+        query += " WHERE " + where.replace('%s', seed.placeholder(connection))
+    return query
+
+def stream_users_in_batches(batch_size, columns=None, where=None, params=(),
+                            stats=None, columnar=False, after=None,
+                            ordered=False):
+    """Generator that yields users in batches from user_data table
+
+    columns/where/params are turned into SQL so only the wanted columns
+    and rows leave the database. When a `stats` dict is given it is
+    filled with the rows and approximate payload bytes received.
+    columnar=True yields ColumnarBatch objects instead of lists of dicts.
+    ordered=True scans in user_id order; after=user_id resumes that
+    ordered scan just past the given key.
+    """
+    params = tuple(params)
+    if after is not None:
+        where = f"user_id > %s AND ({where})" if where else "user_id > %s"
+        params = (after,) + params
+    with pool.connection() as connection:
+        if not connection:
+            return
+
+        query = build_user_query(connection, columns, where)
+        if ordered or after is not None:
+            query += " ORDER BY user_id"
+        cursor = seed.open_cursor(connection, dictionary=not columnar)
+        cursor.execute(query, params)
+
+        names = [column[0] for column in cursor.description]
+        if stats is not None:
+            stats.setdefault('rows', 0)
+            stats.setdefault('bytes', 0)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            if stats is not None:
+                stats['rows'] += len(batch)
+                stats['bytes'] += sum(
+                    len(str(value)) for row in batch
+                    for value in (row.values() if isinstance(row, dict)
+                                  else row))
+            if columnar:
+                yield ColumnarBatch.from_rows(names, batch)
+            else:
+                yield batch
 
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data")
+        cursor.close()
 
-    batch = []
-    for row in cursor:
-        batch.append(row)
-        if len(batch) == batch_size:
-            yield batch
-            batch = []
+def load_checkpoint(path):
+    """Reads a batch checkpoint, or a fresh one if none was saved yet"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'last_user_id': None, 'batches': 0, 'rows': 0}
 
-    if batch:
-        yield batch
+def save_checkpoint(path, checkpoint):
+    """Atomically replaces the checkpoint file (write, fsync, rename)"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
 
+def _load_committed(into, job):
+    """The checkpoint committed in `into` for job, or None"""
+    cursor = into.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS batch_checkpoints (
+            job VARCHAR(255) PRIMARY KEY,
+            state TEXT NOT NULL
+        )
+    """)
+    into.commit()
+    cursor.execute(
+        "SELECT state FROM batch_checkpoints WHERE job = "
+        f"{seed.placeholder(into)}", (job,))
+    row = cursor.fetchone()
     cursor.close()
-    connection.close()
+    return json.loads(row[0]) if row else None
+
+def _stage_checkpoint(into, job, checkpoint):
+    """Writes the checkpoint into the open transaction on `into`"""
+    mark = seed.placeholder(into)
+    cursor = into.cursor()
+    cursor.execute(f"DELETE FROM batch_checkpoints WHERE job = {mark}",
+                   (job,))
+    cursor.execute(
+        f"INSERT INTO batch_checkpoints VALUES ({mark}, {mark})",
+        (job, json.dumps(checkpoint)))
+    cursor.close()
+
+def process_batches_resumable(batch_size, handler, checkpoint_path,
+                              into=None, **query):
+    """Calls handler(batch, batch_number) per batch, resuming after a crash
+
+    The scan runs in user_id order and the checkpoint (last user_id,
+    batch and row counters) is saved after each handler call returns, so
+    a rerun continues from the first unfinished batch.
+
+    On its own this is at-least-once: if the process dies between the
+    handler and the save, that batch is handed to the handler again, with
+    the same batch_number. For exactly-once side effects pass `into`, a
+    database connection the handler writes through: it is called as
+    handler(batch, batch_number, into), and the checkpoint is stored in
+    that database's batch_checkpoints table and committed in the same
+    transaction as the handler's writes. A batch's writes and its
+    checkpoint then land together or not at all, and the file just
+    mirrors the last committed checkpoint. Batch numbers are only stable
+    across runs with the same batch_size and query.
+    """
+    columns = query.get('columns')
+    if columns and 'user_id' not in columns:
+        raise ValueError("Resumable scans need the user_id column")
+    checkpoint = None
+    if into is not None:
+        checkpoint = _load_committed(into, checkpoint_path)
+    if checkpoint is None:
+        checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint.get('batch_size', batch_size) != batch_size:
+        raise ValueError(
+            f"Checkpoint was written with batch_size "
+            f"{checkpoint['batch_size']}, not {batch_size}")
+
+    for batch in stream_users_in_batches(
+            batch_size, after=checkpoint['last_user_id'], ordered=True,
+            **query):
+        number = checkpoint['batches'] + 1
+        done = {
+            'last_user_id': batch[-1]['user_id'],
+            'batches': number,
+            'rows': checkpoint['rows'] + len(batch),
+            'batch_size': batch_size,
+        }
+        if into is None:
+            handler(batch, number)
+        else:
+            try:
+                handler(batch, number, into)
+                _stage_checkpoint(into, checkpoint_path, done)
+                into.commit()
+            except BaseException:
+                into.rollback()
+                raise
+        checkpoint = done
+        save_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint
+
+def _print_batch(batch, batch_number):
+    for user in batch:
+        print(user)
+
+def batch_processing(batch_size, pushdown=True, partitions=None,
+                     columnar=False, checkpoint=None):
+    """Processes each batch to filter users over age 25
+
+    partitions=N scans N user_id ranges in parallel worker processes and
+    prints each batch of matches as it arrives, in no particular order.
+    columnar=True reads ColumnarBatch objects: pushed down, the database
+    filters them; without pushdown, each batch's age column is filtered
+    in one pass. checkpoint=path makes the run resumable from that
+    checkpoint file; printing is not transactional, so a crash can
+    print the last batch again on resume. columnar cannot be combined with partitions or
+    checkpoint.
+    """
+    if columnar and (partitions or checkpoint):
+        raise ValueError(
+            "columnar=True cannot be combined with partitions or checkpoint")
+
+    if checkpoint:
+        process_batches_resumable(batch_size, _print_batch, checkpoint,
+                                  where="age > %s", params=(25,))
+        return
+
+    if partitions:
+        import parallel_scan
+        for batch in parallel_scan.parallel_batches(
+                partitions=partitions, batch_size=batch_size,
+                where="age > %s", params=(25,),
+                connect=pool.get_pool().connect):
+            for user in batch:
+                print(user)
+        return
+
+    if pushdown:
+        for batch in stream_users_in_batches(batch_size, where="age > %s",
+                                             params=(25,), columnar=columnar):
+            for user in batch:
+                print(user)
+        return
+
+    if columnar:
+        for batch in stream_users_in_batches(batch_size, columnar=True):
+            for user in batch.where('age', '>', 25):
+                print(user)
+        return
 
-def batch_processing(batch_size):
-    """Processes each batch to filter users over age 25"""
     for batch in stream_users_in_batches(batch_size):
         for user in batch:
             if user['age'] > 25:
                 print(user)
+
+def compare_transfer(batch_size):
+    """Rows/bytes shipped for the age filter with and without pushdown"""
+    full, pushed = {}, {}
+    for _ in stream_users_in_batches(batch_size, stats=full):
+        pass
+    for _ in stream_users_in_batches(batch_size, where="age > %s",
+                                     params=(25,), stats=pushed):
+        pass
+    return {'full_scan': full, 'pushdown': pushed}
@@ -1,15 +1,61 @@
 #!/usr/bin/python3
+import pool
 import seed
 
+USER_FIELDS = "user_id, name, email, age"
+
 def paginate_users(page_size, offset):
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
+    with pool.connection() as connection:
+        mark = seed.placeholder(connection)
+        cursor = seed.open_cursor(connection, buffered=True)
+        cursor.execute(
+            f"SELECT {USER_FIELDS} FROM user_data LIMIT {mark} OFFSET {mark}",
+            (page_size, offset))
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+def paginate_users_after(page_size, last_user_id=None):
+    """Fetches the page of users that follows last_user_id (keyset seek).
+
+    Seeking on the primary key costs the same for every page, unlike
+    OFFSET which has to walk past every skipped row first.
+    """
+    with pool.connection() as connection:
+        mark = seed.placeholder(connection)
+        cursor = seed.open_cursor(connection, buffered=True)
+        if last_user_id is None:
+            cursor.execute(
+                f"SELECT {USER_FIELDS} FROM user_data "
+                f"ORDER BY user_id LIMIT {mark}",
+                (page_size,))
+        else:
+            cursor.execute(
+                f"SELECT {USER_FIELDS} FROM user_data WHERE user_id > {mark} "
+                f"ORDER BY user_id LIMIT {mark}",
+                (last_user_id, page_size))
+        rows = cursor.fetchall()
+        cursor.close()
     return rows
 
-def lazy_paginate(page_size):
+def lazy_paginate(page_size, keyset=True):
+    """Lazily yields pages of users, fetching the next page only when needed.
+
+    keyset=True seeks on user_id so a full scan stays linear in table
+    size; keyset=False keeps the original LIMIT/OFFSET paging.
+    """
+    if keyset:
+        last_user_id = None
+        while True:
+            page = paginate_users_after(page_size, last_user_id)
+            if not page:
+                break
+            yield page
+            if len(page) < page_size:
+                break
+            last_user_id = page[-1]['user_id']
+        return
+
     offset = 0
     while True:
         page = paginate_users(page_size, offset)
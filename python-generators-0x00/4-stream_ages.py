@@ -1,24 +1,100 @@
 #!/usr/bin/python3
+import math
+from array import array
+
+import pool
 import seed
+from stats import StreamingStats
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 def stream_user_ages():
     """Generator that yields user ages one by one"""
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT age FROM user_data")
-    
-    for row in cursor:
-        yield row['age']
-    
-    cursor.close()
-    connection.close()
-
-def calculate_average_age():
-    total_age = 0
-    count = 0
-    for age in stream_user_ages():
-        total_age += age
-        count += 1
+    with pool.connection() as connection:
+        if not connection:
+            return
+
+        cursor = seed.open_cursor(connection)
+        cursor.execute("SELECT age FROM user_data")
+
+        for row in cursor:
+            yield row['age']
+
+        cursor.close()
+
+def stream_user_age_chunks(chunk_size=10000, use_numpy=None):
+    """Generator that yields ages as contiguous float buffers
+
+    Each chunk is a numpy float64 array when numpy is installed (or
+    use_numpy=True), otherwise an array('d'), so aggregations can run
+    over a whole chunk at once instead of one Decimal per row.
+    """
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    with pool.connection() as connection:
+        if not connection:
+            return
+
+        cursor = seed.open_cursor(connection, dictionary=False)
+        cursor.execute("SELECT age FROM user_data")
+
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if use_numpy:
+                yield numpy.fromiter((row[0] for row in rows),
+                                     dtype=numpy.float64, count=len(rows))
+            else:
+                yield array('d', [row[0] for row in rows])
+
+        cursor.close()
+
+def _chunk_sum(chunk):
+    if numpy is not None and isinstance(chunk, numpy.ndarray):
+        return float(chunk.sum())
+    return math.fsum(chunk)
+
+def sum_and_count_ages():
+    """Lets the server compute SUM/COUNT when only the mean is needed"""
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT SUM(age), COUNT(*) FROM user_data")
+        total_age, count = cursor.fetchone()
+        cursor.close()
+    return total_age or 0, count
+
+def summarize_ages(chunk_size=10000):
+    """Mean, variance, min/max and p50/p95/p99 of all ages in one pass"""
+    summary = StreamingStats()
+    for chunk in stream_user_age_chunks(chunk_size):
+        summary.update(chunk)
+    return summary
+
+def _age_sum_count(batch):
+    return math.fsum(float(row['age']) for row in batch), len(batch)
+
+def _add_sum_counts(left, right):
+    return left[0] + right[0], left[1] + right[1]
+
+def calculate_average_age(pushdown=False, chunk_size=10000, partitions=None):
+    if pushdown:
+        total_age, count = sum_and_count_ages()
+    elif partitions:
+        import parallel_scan
+        total_age, count = parallel_scan.parallel_map_reduce(
+            _age_sum_count, _add_sum_counts, initial=(0.0, 0),
+            partitions=partitions, batch_size=chunk_size, columns=['age'],
+            connect=pool.get_pool().connect)
+    else:
+        total_age = 0.0
+        count = 0
+        for chunk in stream_user_age_chunks(chunk_size):
+            total_age += _chunk_sum(chunk)
+            count += len(chunk)
     if count == 0:
         print("Average age of users: 0")
     else:
@@ -0,0 +1,221 @@
+#!/usr/bin/python3
+"""Group-by aggregation over the streamed user_data rows.
+
+    aggregate_users('email_domain')     # count/sum/mean/min/max of age
+    aggregate_users('age_decile')       # an age histogram
+
+Named keys (GROUP_KEYS) have an SQL form, so by default the GROUP BY is
+pushed down to the database. Otherwise, or for a callable key, rows
+are streamed in batches into a hash-based GroupBy. Its partial results
+merge, so the scan can also run over parallel_scan's user_id ranges.
+When a GroupBy holds more than `max_groups` groups it spills them to
+disk, hash-partitioned, and merges one partition at a time at the end.
+"""
+import os
+import pickle
+import shutil
+import tempfile
+import uuid
+import zlib
+from functools import partial
+
+import pool
+import seed
+
+batches = __import__('1-batch_processing')
+
+
+def email_domain(row):
+    return row['email'].rsplit('@', 1)[-1].lower()
+
+
+def age_decile(row):
+    return int(row['age']) // 10 * 10
+
+
+# name -> (python key, columns it reads, MySQL expr, SQLite expr)
+GROUP_KEYS = {
+    'email_domain': (
+        email_domain, ('email',),
+        "LOWER(SUBSTRING_INDEX(email, '@', -1))",
+        "LOWER(SUBSTR(email, INSTR(email, '@') + 1))",
+    ),
+    'age_decile': (
+        age_decile, ('age',),
+        "FLOOR(age / 10) * 10",
+        "CAST(age / 10 AS INTEGER) * 10",
+    ),
+}
+
+
+def _merge_state(groups, key, state):
+    current = groups.get(key)
+    if current is None:
+        groups[key] = list(state)
+        return
+    current[0] += state[0]
+    current[1] += state[1]
+    if state[2] < current[2]:
+        current[2] = state[2]
+    if state[3] > current[3]:
+        current[3] = state[3]
+
+
+def _summary(state):
+    count, total, low, high = state
+    return {'count': count, 'sum': total, 'mean': total / count if count
+            else 0.0, 'min': low, 'max': high}
+
+
+class GroupBy:
+    """Hash group-by keeping count/sum/min/max of one value per group"""
+
+    def __init__(self, key, value='age', max_groups=100000, spill_dir=None,
+                 partitions=16):
+        self.key = GROUP_KEYS[key][0] if isinstance(key, str) else key
+        self.value = value
+        self.max_groups = max_groups
+        self.spill_dir = spill_dir
+        self.partitions = partitions
+        self.groups = {}
+        self.spilled = []
+
+    def add_batch(self, batch):
+        key_of, value, groups = self.key, self.value, self.groups
+        for row in batch:
+            amount = float(row[value]) if value else 0.0
+            key = key_of(row)
+            state = groups.get(key)
+            if state is None:
+                groups[key] = [1, amount, amount, amount]
+                continue
+            state[0] += 1
+            state[1] += amount
+            if amount < state[2]:
+                state[2] = amount
+            elif amount > state[3]:
+                state[3] = amount
+        if self.max_groups and len(groups) > self.max_groups:
+            self.spill()
+        return self
+
+    def merge(self, other):
+        """Folds another GroupBy's groups (and spill files) into this one"""
+        for key, state in other.groups.items():
+            _merge_state(self.groups, key, state)
+        self.spilled.extend(other.spilled)
+        other.groups, other.spilled = {}, []
+        if self.max_groups and len(self.groups) > self.max_groups:
+            self.spill()
+        return self
+
+    def _partition(self, key):
+        # Stable across processes, unlike hash() of a str
+        return zlib.crc32(repr(key).encode('utf-8')) % self.partitions
+
+    def spill(self):
+        """Writes the in-memory groups to per-partition files and clears them"""
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='groupby-')
+        parts = [{} for _ in range(self.partitions)]
+        for key, state in self.groups.items():
+            parts[self._partition(key)][key] = state
+        run = uuid.uuid4().hex
+        for index, part in enumerate(parts):
+            if not part:
+                continue
+            path = os.path.join(self.spill_dir, f"{run}-{index}.pickle")
+            with open(path, 'wb') as f:
+                pickle.dump(part, f, pickle.HIGHEST_PROTOCOL)
+            self.spilled.append((index, path))
+        self.groups = {}
+
+    def items(self):
+        """Yields (key, summary) pairs, one spill partition at a time"""
+        if not self.spilled:
+            for key, state in self.groups.items():
+                yield key, _summary(state)
+            return
+        self.spill()
+        for index in range(self.partitions):
+            merged = {}
+            for part_index, path in self.spilled:
+                if part_index != index:
+                    continue
+                with open(path, 'rb') as f:
+                    for key, state in pickle.load(f).items():
+                        _merge_state(merged, key, state)
+            for key, state in merged.items():
+                yield key, _summary(state)
+
+    def close(self):
+        """Removes spill files"""
+        for _, path in self.spilled:
+            if os.path.exists(path):
+                os.remove(path)
+        self.spilled = []
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+def group_batch(key, value, max_groups, spill_dir, batch):
+    """parallel_scan map_batch: one batch -> GroupBy partial"""
+    return GroupBy(key, value, max_groups, spill_dir).add_batch(batch)
+
+
+def merge_groups(left, right):
+    return left.merge(right)
+
+
+def _pushdown(key, value):
+    with pool.connection() as connection:
+        mysql_expr, sqlite_expr = GROUP_KEYS[key][2:]
+        expression = sqlite_expr if seed.is_sqlite(connection) else mysql_expr
+        measure = value or '0'
+        cursor = seed.open_cursor(connection, dictionary=False)
+        cursor.execute(
+            f"SELECT {expression} AS group_key, COUNT(*), SUM({measure}), "
+            f"MIN({measure}), MAX({measure}) FROM user_data "
+            "GROUP BY group_key")
+        rows = cursor.fetchall()
+        cursor.close()
+    return {group: _summary([count, float(total), float(low), float(high)])
+            for group, count, total, low, high in rows}
+
+
+def aggregate_users(key, value='age', pushdown=True, partitions=None,
+                    batch_size=10000, max_groups=100000):
+    """Returns {group: {count, sum, mean, min, max}} over all users
+
+    key is a GROUP_KEYS name or a callable taking a row dict (callables
+    passed with partitions= must be picklable). pushdown=False forces
+    the streaming engine even for named keys.
+    """
+    if value and value not in batches.USER_COLUMNS:
+        raise ValueError(f"Unknown user_data column: {value}")
+    if pushdown and isinstance(key, str):
+        return _pushdown(key, value)
+
+    columns = None
+    if isinstance(key, str):
+        needed = GROUP_KEYS[key][1] + ((value,) if value else ())
+        columns = list(dict.fromkeys(needed))
+    spill_dir = tempfile.mkdtemp(prefix='groupby-')
+    try:
+        if partitions:
+            import parallel_scan
+            groups = parallel_scan.parallel_map_reduce(
+                partial(group_batch, key, value, max_groups, spill_dir),
+                merge_groups, partitions=partitions, batch_size=batch_size,
+                columns=columns, connect=pool.get_pool().connect)
+            if groups is None:
+                groups = GroupBy(key, value, max_groups, spill_dir)
+        else:
+            groups = GroupBy(key, value, max_groups, spill_dir)
+            for batch in batches.stream_users_in_batches(batch_size,
+                                                         columns=columns):
+                groups.add_batch(batch)
+        return groups.to_dict()
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+"""Async generator versions of the user_data streams.
+
+Each stream runs its fetches in a producer task that fills a bounded
+queue of at most `prefetch` batches. A slow consumer therefore pauses
+the fetcher instead of letting rows pile up, and the event loop stays
+free to run other scans concurrently.
+
+Backed by aiomysql for ALX_prodev, or aiosqlite for the SQLite stand-in
+(see sqlite_connector).
+"""
+import asyncio
+from contextlib import aclosing
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+_DONE = object()
+USER_FIELDS = "user_id, name, email, age"
+
+
+async def connect_to_prodev_async():
+    """aiomysql connection to ALX_prodev"""
+    if aiomysql is None:
+        raise RuntimeError("aiomysql is required for async MySQL streams")
+    return await aiomysql.connect(
+        host='localhost',
+        user='root',
+        password='your_mysql_password',  # change this
+        db='ALX_prodev'
+    )
+
+
+def sqlite_connector(db_path='ALX_prodev.db'):
+    """Returns a connect() coroutine function for the SQLite stand-in"""
+    if aiosqlite is None:
+        raise RuntimeError("aiosqlite is required for async SQLite streams")
+
+    async def connect():
+        return await aiosqlite.connect(db_path)
+    return connect
+
+
+def _is_sqlite(connection):
+    return aiosqlite is not None and isinstance(connection, aiosqlite.Connection)
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+async def _execute(connection, query, params=()):
+    """Runs query on an unbuffered dict cursor and returns the cursor"""
+    if _is_sqlite(connection):
+        connection.row_factory = _dict_row
+        return await connection.execute(query.replace('%s', '?'), params)
+    cursor = await connection.cursor(aiomysql.SSDictCursor)
+    await cursor.execute(query, params)
+    return cursor
+
+
+async def _close(connection):
+    if _is_sqlite(connection):
+        await connection.close()
+    else:
+        connection.close()
+
+
+async def _prefetched(fetch, prefetch):
+    """Yields fetch() results read ahead by a producer task.
+
+    fetch is a coroutine function returning the next batch, or an empty
+    batch when exhausted. At most `prefetch` batches are buffered.
+    """
+    queue = asyncio.Queue(maxsize=prefetch)
+
+    async def produce():
+        try:
+            while True:
+                batch = await fetch()
+                if not batch:
+                    break
+                await queue.put(batch)
+        except Exception as err:
+            await queue.put(err)
+        else:
+            await queue.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+
+async def async_stream_users_in_batches(batch_size, connect=None, prefetch=4):
+    """Async generator that yields users in batches from user_data table"""
+    connection = await (connect or connect_to_prodev_async)()
+    try:
+        cursor = await _execute(connection,
+                                f"SELECT {USER_FIELDS} FROM user_data")
+
+        async def fetch():
+            return await cursor.fetchmany(batch_size)
+
+        # aclosing: stop the producer before the connection is closed
+        async with aclosing(_prefetched(fetch, prefetch)) as batches:
+            async for batch in batches:
+                yield batch
+        await cursor.close()
+    finally:
+        await _close(connection)
+
+
+async def async_stream_users(connect=None, arraysize=1000, prefetch=4):
+    """Async generator that yields one user row at a time"""
+    batches = async_stream_users_in_batches(arraysize, connect, prefetch)
+    async with aclosing(batches):
+        async for batch in batches:
+            for row in batch:
+                yield row
+
+
+async def async_lazy_paginate(page_size, connect=None, prefetch=2):
+    """Async generator that yields keyset-paginated pages of users"""
+    connection = await (connect or connect_to_prodev_async)()
+    last_user_id = None
+
+    async def fetch():
+        nonlocal last_user_id
+        if last_user_id is None:
+            cursor = await _execute(
+                connection,
+                f"SELECT {USER_FIELDS} FROM user_data "
+                "ORDER BY user_id LIMIT %s",
+                (page_size,))
+        else:
+            cursor = await _execute(
+                connection,
+                f"SELECT {USER_FIELDS} FROM user_data WHERE user_id > %s "
+                "ORDER BY user_id LIMIT %s",
+                (last_user_id, page_size))
+        page = list(await cursor.fetchall())
+        await cursor.close()
+        if page:
+            last_user_id = page[-1]['user_id']
+        return page
+
+    try:
+        async with aclosing(_prefetched(fetch, prefetch)) as pages:
+            async for page in pages:
+                yield page
+    finally:
+        await _close(connection)
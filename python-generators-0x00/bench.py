@@ -0,0 +1,185 @@
+#!/usr/bin/python3
+"""Throughput and memory benchmarks for the user_data generators.
+
+    python3 bench.py --sizes 10000 100000 --output bench.json
+    python3 bench.py --sizes 10000 --compare bench.json
+
+Each generator is run over synthetic SQLite stand-in tables (built once
+per size with synthetic.load_database and reused) in a fresh process,
+so peak RSS belongs to that run alone. Every result records rows/sec,
+time to first row, tracemalloc peak and max RSS. The JSON output keeps a
+stable key and row order so files from two commits diff cleanly.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+
+import pool
+import seed
+import synthetic
+
+DEFAULT_SIZES = (10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7)
+
+# name -> (module, function, takes batch size, yields batches)
+GENERATORS = {
+    'stream_users': ('0-stream_users', 'stream_users', False, False),
+    'stream_users_in_batches': ('1-batch_processing',
+                                'stream_users_in_batches', True, True),
+    'lazy_paginate': ('2-lazy_paginate', 'lazy_paginate', True, True),
+    'stream_user_ages': ('4-stream_ages', 'stream_user_ages', False, False),
+    'stream_user_age_chunks': ('4-stream_ages', 'stream_user_age_chunks',
+                               True, True),
+}
+
+
+def prepare_table(db_dir, rows, seed_value=0):
+    """Returns the path of a synthetic table with `rows` users"""
+    path = os.path.join(db_dir, f"bench_{rows}_{seed_value}.db")
+    if os.path.exists(path):
+        return path
+    building = f"{path}.building"
+    if os.path.exists(building):
+        os.remove(building)
+    connection = seed.connect_sqlite(building)
+    seed.create_table(connection)
+    synthetic.load_database(connection, rows, seed_value)
+    connection.close()
+    os.replace(building, path)
+    return path
+
+
+def _drain(name, batch_size):
+    module, function, sized, batched = GENERATORS[name]
+    generator = getattr(__import__(module), function)
+    started = time.perf_counter()
+    stream = generator(batch_size) if sized else generator()
+    first_row = None
+    rows = 0
+    for item in stream:
+        if first_row is None:
+            first_row = time.perf_counter() - started
+        rows += len(item) if batched else 1
+    return rows, time.perf_counter() - started, first_row
+
+
+def _max_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def run_one(name, db_path, batch_size, trace_memory=True):
+    """Runs one generator to exhaustion; meant for a fresh process"""
+    pool.configure(connect=partial(seed.connect_sqlite, db_path), size=1)
+    rows, seconds, first_row = _drain(name, batch_size)
+    result = {
+        'generator': name,
+        'rows': rows,
+        'seconds': round(seconds, 6),
+        'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+        'time_to_first_row': round(first_row or 0.0, 6),
+        # Read before the tracemalloc pass, whose bookkeeping inflates RSS
+        'max_rss_kb': _max_rss_kb(),
+    }
+    if trace_memory:
+        # Separate pass: tracemalloc slows allocation-heavy code down
+        tracemalloc.start()
+        _drain(name, batch_size)
+        result['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def _metadata():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlite': sqlite3.sqlite_version,
+    }
+
+
+def run_suite(sizes=DEFAULT_SIZES, generators=None, batch_size=1000,
+              db_dir=tempfile.gettempdir(), trace_memory=True):
+    """Benchmarks every generator at every size, one process per run"""
+    generators = generators or list(GENERATORS)
+    results = []
+    for rows in sizes:
+        db_path = prepare_table(db_dir, rows)
+        for name in generators:
+            with ProcessPoolExecutor(1, mp_context=get_context('spawn')) \
+                    as executor:
+                result = executor.submit(run_one, name, db_path, batch_size,
+                                         trace_memory).result()
+            result['table_rows'] = rows
+            result['batch_size'] = batch_size
+            results.append(result)
+            print(f"{name:>24} {rows:>9} rows  "
+                  f"{result['rows_per_sec'] or 0:>12.0f} rows/s  "
+                  f"first row {result['time_to_first_row'] * 1000:.2f} ms  "
+                  f"rss {result['max_rss_kb']} kB")
+    return {'meta': _metadata(), 'results': results}
+
+
+def compare(old, new):
+    """Prints rows/sec and memory ratios of `new` against `old` results"""
+    before = {(r['generator'], r['table_rows']): r for r in old['results']}
+    for result in new['results']:
+        key = (result['generator'], result['table_rows'])
+        if key not in before:
+            continue
+        old_result = before[key]
+        speed = (result['rows_per_sec'] or 0) / (old_result['rows_per_sec']
+                                                 or 1)
+        line = f"{key[0]:>24} {key[1]:>9}  rows/s x{speed:.2f}"
+        if 'tracemalloc_peak_bytes' in result and \
+                'tracemalloc_peak_bytes' in old_result:
+            memory = result['tracemalloc_peak_bytes'] / max(
+                old_result['tracemalloc_peak_bytes'], 1)
+            line += f"  peak mem x{memory:.2f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=list(DEFAULT_SIZES))
+    parser.add_argument('--generators', nargs='+', choices=list(GENERATORS))
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--db-dir', default=tempfile.gettempdir(),
+                        help="where synthetic tables are built and reused")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="previous results JSON to diff")
+    parser.add_argument('--no-tracemalloc', action='store_true')
+    args = parser.parse_args()
+
+    report = run_suite(args.sizes, args.generators, args.batch_size,
+                       args.db_dir, not args.no_tracemalloc)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+"""Columnar batches for stream_users_in_batches(columnar=True).
+
+A ColumnarBatch keeps one array per column instead of one dict per row:
+`age` is an array('d'), text columns are plain lists of str. Filters run
+over a whole column at once (vectorized with numpy when installed), and
+UserRow gives a light __slots__ view for code that wants rows.
+"""
+import operator
+from array import array
+from itertools import compress
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NUMERIC_COLUMNS = ('age',)
+
+_OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+
+class UserRow:
+    """Read-only view of one row of a ColumnarBatch"""
+    __slots__ = ('_batch', '_index')
+
+    def __init__(self, batch, index):
+        self._batch = batch
+        self._index = index
+
+    def __getitem__(self, column):
+        return self._batch.columns[column][self._index]
+
+    def __getattr__(self, column):
+        try:
+            return self._batch.columns[column][self._index]
+        except KeyError:
+            raise AttributeError(column) from None
+
+    def keys(self):
+        return self._batch.names
+
+    def as_dict(self):
+        return {name: self[name] for name in self._batch.names}
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+
+class ColumnarBatch:
+    """Parallel per-column arrays for a batch of user_data rows"""
+    __slots__ = ('names', 'columns', '_length')
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.names = tuple(columns)
+        self._length = len(next(iter(columns.values()))) if columns else 0
+
+    @classmethod
+    def from_rows(cls, names, rows):
+        """Builds a batch from tuple rows in `names` column order"""
+        values = zip(*rows) if rows else ([] for _ in names)
+        columns = {}
+        for name, column in zip(names, values):
+            if name in NUMERIC_COLUMNS:
+                columns[name] = array('d', map(float, column))
+            else:
+                columns[name] = list(column)
+        return cls(columns)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield UserRow(self, index)
+
+    def __getitem__(self, index):
+        if not -self._length <= index < self._length:
+            raise IndexError(index)
+        return UserRow(self, index % self._length)
+
+    def column(self, name):
+        return self.columns[name]
+
+    def mask(self, name, op, value):
+        """Boolean mask of rows where `column op value` holds"""
+        compare = _OPERATORS[op]
+        column = self.columns[name]
+        if numpy is not None and isinstance(column, array):
+            return compare(numpy.frombuffer(column, dtype=numpy.float64),
+                           value)
+        return [compare(item, value) for item in column]
+
+    def filter(self, mask):
+        """New batch holding only the rows selected by mask"""
+        if numpy is not None and isinstance(mask, numpy.ndarray):
+            indexes = numpy.flatnonzero(mask)
+            columns = {}
+            for name, column in self.columns.items():
+                if isinstance(column, array):
+                    picked = numpy.frombuffer(column, dtype=numpy.float64)
+                    columns[name] = array('d', picked[indexes].tobytes())
+                else:
+                    columns[name] = [column[i] for i in indexes]
+            return ColumnarBatch(columns)
+        columns = {}
+        for name, column in self.columns.items():
+            picked = compress(column, mask)
+            columns[name] = (array('d', picked) if isinstance(column, array)
+                             else list(picked))
+        return ColumnarBatch(columns)
+
+    def where(self, name, op, value):
+        """Shorthand for filter(mask(name, op, value))"""
+        return self.filter(self.mask(name, op, value))
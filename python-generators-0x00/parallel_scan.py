@@ -0,0 +1,188 @@
+#!/usr/bin/python3
+"""Range-partitioned parallel scan of user_data.
+
+The user_id keyspace (UUID strings) is cut into N contiguous ranges on
+its leading hex digits and each range is scanned by its own process on
+its own connection. Every worker folds its batches into one partial
+result with `map_batch`/`merge`, and the driver merges the partials.
+parallel_batches instead streams the raw batches back as they arrive.
+
+map_batch, merge and connect are sent to worker processes, so they must
+be picklable (module-level functions or functools.partial of them).
+"""
+import multiprocessing
+import os
+import queue
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import seed
+
+batch_query = __import__('1-batch_processing')
+
+KEY_DIGITS = 8
+
+
+def key_ranges(partitions):
+    """Splits the user_id keyspace into `partitions` (low, high) bounds.
+
+    The first low and the last high are None (unbounded).
+    """
+    space = 16 ** KEY_DIGITS
+    bounds = [None]
+    bounds += [format(i * space // partitions, f'0{KEY_DIGITS}x')
+               for i in range(1, partitions)]
+    bounds.append(None)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _range_condition(low, high, where):
+    conditions = []
+    params = []
+    if low is not None:
+        conditions.append("user_id >= %s")
+        params.append(low)
+    if high is not None:
+        conditions.append("user_id < %s")
+        params.append(high)
+    if where:
+        conditions.append(f"({where})")
+    return " AND ".join(conditions) or None, params
+
+
+def _range_batches(bounds, batch_size=1000, columns=None, where=None,
+                   params=(), ordered=False, connect=None):
+    low, high = bounds
+    condition, range_params = _range_condition(low, high, where)
+    connection = (connect or seed.connect_to_prodev)()
+    try:
+        query = batch_query.build_user_query(connection, columns, condition)
+        if ordered:
+            query += " ORDER BY user_id"
+        cursor = seed.open_cursor(connection)
+        cursor.execute(query, tuple(range_params) + tuple(params))
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def scan_range(bounds, map_batch, merge, **scan_options):
+    """Worker: scans one key range and folds it into a partial result"""
+    partial = None
+    for batch in _range_batches(bounds, **scan_options):
+        result = map_batch(batch)
+        partial = result if partial is None else merge(partial, result)
+    return partial
+
+
+class _RangeDone:
+    def __init__(self, bounds):
+        self.bounds = bounds
+
+
+class _RangeFailed:
+    def __init__(self, bounds, details):
+        self.bounds = bounds
+        self.details = details
+
+
+def _feed_range(bounds, out, **scan_options):
+    """Worker: puts one key range's batches on `out`, then _RangeDone"""
+    try:
+        for batch in _range_batches(bounds, **scan_options):
+            out.put(batch)
+    except Exception:
+        # The traceback text always pickles, a driver exception may not
+        out.put(_RangeFailed(bounds, traceback.format_exc()))
+        return
+    out.put(_RangeDone(bounds))
+
+
+def _receive(out, running):
+    while True:
+        try:
+            item = out.get(timeout=1)
+        except queue.Empty:
+            dead = [bounds for bounds, worker in running.items()
+                    if not worker.is_alive()]
+            if not dead:
+                continue
+            try:
+                item = out.get_nowait()
+            except queue.Empty:
+                raise RuntimeError(
+                    f"Scan of user_id range {dead[0]} exited with code "
+                    f"{running[dead[0]].exitcode}") from None
+        if isinstance(item, _RangeFailed):
+            raise RuntimeError(f"Scan of user_id range {item.bounds} "
+                               f"failed:\n{item.details}")
+        return item
+
+
+def parallel_scan(map_batch, merge, partitions=None, ordered=False,
+                  **scan_options):
+    """Generator that yields one partial result per key range.
+
+    Partials arrive as workers finish, or in user_id order when
+    ordered=True (each range is then also scanned in user_id order).
+    Ranges with no rows are skipped. scan_options go to scan_range.
+    """
+    partitions = partitions or os.cpu_count() or 1
+    with ProcessPoolExecutor(partitions) as executor:
+        futures = [
+            executor.submit(scan_range, bounds, map_batch, merge,
+                            ordered=ordered, **scan_options)
+            for bounds in key_ranges(partitions)
+        ]
+        for future in (futures if ordered else as_completed(futures)):
+            partial = future.result()
+            if partial is not None:
+                yield partial
+
+
+def parallel_map_reduce(map_batch, merge, initial=None, **options):
+    """Scans user_data in parallel and merges every partial into one"""
+    result = initial
+    for partial in parallel_scan(map_batch, merge, **options):
+        result = partial if result is None else merge(result, partial)
+    return result
+
+
+def parallel_batches(partitions=None, prefetch=8, **scan_options):
+    """Generator that yields every range's batches as they arrive.
+
+    Each range is scanned by its own process and all of them feed one
+    queue of at most `prefetch` batches, so memory stays bounded however
+    large the table and no worker waits on another range. Batches from
+    different ranges interleave in no particular order. A failed range
+    raises RuntimeError, and closing the generator early stops the
+    workers. scan_options go to scan_range, minus map_batch/merge.
+    """
+    partitions = partitions or os.cpu_count() or 1
+    context = multiprocessing.get_context()
+    out = context.Queue(prefetch)
+    running = {
+        bounds: context.Process(target=_feed_range, args=(bounds, out),
+                                kwargs=scan_options, daemon=True)
+        for bounds in key_ranges(partitions)
+    }
+    workers = list(running.values())
+    for worker in workers:
+        worker.start()
+    try:
+        while running:
+            item = _receive(out, running)
+            if isinstance(item, _RangeDone):
+                del running[item.bounds]
+            else:
+                yield item
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
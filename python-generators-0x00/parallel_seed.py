@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+"""Parallel CSV ingest for user_data.
+
+Parser processes each take a byte range of the CSV and turn it into
+ready-to-insert (user_id, name, email, age) tuples; writer threads load
+those chunks through seed.insert_rows_bulk. A bounded queue sits between
+the two stages, so memory stays flat however large the file is.
+
+Shards are split on line boundaries, so quoted fields must not contain
+embedded newlines (user_data.csv never does).
+"""
+import csv
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+import seed
+
+READ_BLOCK = 1 << 20
+_STOP = 'STOP'
+
+
+def csv_shards(file_path, shards):
+    """Splits the CSV body into up to `shards` line-aligned byte ranges.
+
+    Returns (header, ranges), ranges being a list of (start, end) offsets.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        header_line = f.readline()
+        body_start = f.tell()
+        boundaries = [body_start]
+        for i in range(1, shards):
+            f.seek(body_start + i * (size - body_start) // shards)
+            f.readline()
+            boundaries.append(min(f.tell(), size))
+    boundaries.append(size)
+    header = next(csv.reader([header_line.decode('utf-8')]))
+    ranges = [(start, end) for start, end in zip(boundaries, boundaries[1:])
+              if start < end]
+    return header, ranges
+
+
+def _read_lines(file_path, start, end):
+    """Yields the decoded lines of the byte range [start, end)"""
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        while f.tell() < end:
+            block = f.read(min(READ_BLOCK, end - f.tell()))
+            if not block.endswith(b'\n') and f.tell() < end:
+                block += f.readline()
+            yield from block.decode('utf-8').splitlines()
+
+
+def parse_shard(file_path, start, end, columns, chunk_size, out_queue):
+    """Worker: parses one byte range and puts tuple chunks on out_queue"""
+    name_at, email_at, age_at = columns
+    uuid4 = uuid.uuid4
+    chunk = []
+    for row in csv.reader(_read_lines(file_path, start, end)):
+        if not row:
+            continue
+        chunk.append((str(uuid4()), row[name_at], row[email_at],
+                      row[age_at]))
+        if len(chunk) == chunk_size:
+            out_queue.put(chunk)
+            chunk = []
+    if chunk:
+        out_queue.put(chunk)
+
+
+def _queued_chunks(in_queue):
+    while True:
+        chunk = in_queue.get()
+        if chunk == _STOP:
+            return
+        yield chunk
+
+
+def _write(connect, in_queue, results, errors):
+    """Writer thread: loads chunks until it sees the stop marker"""
+    try:
+        connection = connect()
+        try:
+            total, _ = seed.insert_rows_bulk(
+                connection, _queued_chunks(in_queue))
+        finally:
+            connection.close()
+        results.append(total)
+    except Exception as err:
+        errors.append(err)
+        # Keep draining so parsers never block on a full queue
+        for _ in _queued_chunks(in_queue):
+            pass
+
+
+def insert_data_parallel(file_path, connect=None, workers=None, writers=1,
+                         chunk_size=1000, queue_size=8):
+    """Loads the CSV with `workers` parser processes and `writers` writers.
+
+    At most queue_size chunks of chunk_size rows are in flight between
+    parsers and writers. Returns the number of rows inserted.
+    """
+    connect = connect or seed.connect_to_prodev
+    workers = workers or os.cpu_count() or 1
+    header, ranges = csv_shards(file_path, workers)
+    columns = (header.index('name'), header.index('email'),
+               header.index('age'))
+
+    ctx = multiprocessing.get_context()
+    chunks = ctx.Queue(maxsize=queue_size)
+    results, errors = [], []
+    started = time.perf_counter()
+
+    writer_threads = [
+        threading.Thread(target=_write,
+                         args=(connect, chunks, results, errors))
+        for _ in range(writers)
+    ]
+    for thread in writer_threads:
+        thread.start()
+
+    parsers = [
+        ctx.Process(target=parse_shard,
+                    args=(file_path, start, end, columns, chunk_size, chunks))
+        for start, end in ranges
+    ]
+    for process in parsers:
+        process.start()
+    for process in parsers:
+        process.join()
+
+    for _ in writer_threads:
+        chunks.put(_STOP)
+    for thread in writer_threads:
+        thread.join()
+
+    failed = [p.exitcode for p in parsers if p.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"{len(failed)} CSV parser process(es) failed")
+    if errors:
+        raise errors[0]
+
+    total = sum(results)
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed else 0.0
+    print(f"Inserted {total} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    return total
@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+"""Composable lazy pipelines over the user_data stream generators.
+
+    adults = (Pipeline(stream_users())
+              .filter(lambda user: user['age'] > 25)
+              .map(lambda user: user['email'])
+              .batch(100))
+    for emails in adults:
+        ...
+
+Stages are only recorded until the pipeline is iterated or reduced.
+Execution is push-based: each run of adjacent map/filter/take stages is
+fused into a single loop over the stage functions instead of one
+generator per stage, and batch/window just buffer between those loops.
+stats() reports rows in/out per stage; with profile=True it also times
+every stage call (at some cost).
+"""
+import time
+from collections import deque
+
+_MISSING = object()
+_ROW_STAGES = ('map', 'filter', 'take')
+
+
+class StageStats:
+    __slots__ = ('name', 'kind', 'rows_in', 'rows_out', 'seconds')
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.rows_in = 0
+        self.rows_out = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {'name': self.name, 'kind': self.kind,
+                'rows_in': self.rows_in, 'rows_out': self.rows_out,
+                'seconds': self.seconds}
+
+
+def _fused(stages, downstream, clock):
+    """One push function running a run of map/filter/take stages"""
+    remaining = {id(stats): arg for kind, arg, stats in stages
+                 if kind == 'take'}
+
+    def push(item):
+        for kind, arg, stats in stages:
+            stats.rows_in += 1
+            if clock is not None:
+                started = clock()
+            if kind == 'map':
+                item = arg(item)
+            elif kind == 'filter':
+                if not arg(item):
+                    if clock is not None:
+                        stats.seconds += clock() - started
+                    return True
+            else:
+                left = remaining[id(stats)]
+                if left <= 0:
+                    return False
+                remaining[id(stats)] = left - 1
+            if clock is not None:
+                stats.seconds += clock() - started
+            stats.rows_out += 1
+        more = downstream(item)
+        return more and all(left > 0 for left in remaining.values())
+    return push
+
+
+def _batcher(size, stats, downstream):
+    buffer = []
+
+    def push(item):
+        stats.rows_in += 1
+        buffer.append(item)
+        if len(buffer) < size:
+            return True
+        return flush()
+
+    def flush():
+        nonlocal buffer
+        if not buffer:
+            return True
+        batch, buffer = buffer, []
+        stats.rows_out += 1
+        return downstream(batch)
+    return push, flush
+
+
+def _windower(size, step, stats, downstream):
+    window = deque(maxlen=size)
+    until_emit = [size]
+
+    def push(item):
+        stats.rows_in += 1
+        window.append(item)
+        until_emit[0] -= 1
+        if until_emit[0] > 0:
+            return True
+        until_emit[0] = step
+        stats.rows_out += 1
+        return downstream(tuple(window))
+    return push, None
+
+
+class Pipeline:
+    """Lazily composed stages over any iterable of rows or batches"""
+
+    def __init__(self, source, profile=False, _stages=()):
+        self._source = source
+        self._profile = profile
+        self._stages = list(_stages)
+        self._stats = []
+
+    def _then(self, kind, arg, name):
+        stage = (kind, arg, name or f"{kind}{len(self._stages)}")
+        return Pipeline(self._source, self._profile, self._stages + [stage])
+
+    def map(self, function, name=None):
+        return self._then('map', function, name)
+
+    def filter(self, predicate, name=None):
+        return self._then('filter', predicate, name)
+
+    def take(self, count, name=None):
+        return self._then('take', count, name)
+
+    def batch(self, size, name=None):
+        if size < 1:
+            raise ValueError("batch size must be at least 1")
+        return self._then('batch', size, name)
+
+    def window(self, size, step=1, name=None):
+        """Sliding windows of `size` items, emitted every `step` items"""
+        if size < 1 or step < 1:
+            raise ValueError("window size and step must be at least 1")
+        return self._then('window', (size, step), name)
+
+    def _compile(self, sink):
+        """Builds the push chain back to front; returns (push, flushes)"""
+        clock = time.perf_counter if self._profile else None
+        self._stats = [StageStats(name, kind)
+                       for kind, _, name in self._stages]
+        staged = [(kind, arg, stats) for (kind, arg, _), stats
+                  in zip(self._stages, self._stats)]
+
+        push, flushes = sink, []
+        index = len(staged)
+        while index > 0:
+            kind, arg, stats = staged[index - 1]
+            if kind in _ROW_STAGES:
+                start = index - 1
+                while start > 0 and staged[start - 1][0] in _ROW_STAGES:
+                    start -= 1
+                push = _fused(staged[start:index], push, clock)
+                index = start
+                continue
+            if kind == 'batch':
+                push, flush = _batcher(arg, stats, push)
+            else:
+                push, flush = _windower(arg[0], arg[1], stats, push)
+            if flush is not None:
+                flushes.insert(0, flush)
+            index -= 1
+        return push, flushes
+
+    # A push returning False only means "stop pulling from the source":
+    # buffered batches still flush, and a take below a batch that is
+    # already satisfied simply rejects what they push.
+    def _run(self, sink):
+        push, flushes = self._compile(sink)
+        source = iter(self._source)
+        try:
+            for item in source:
+                if not push(item):
+                    break
+            for flush in flushes:
+                flush()
+        finally:
+            close = getattr(source, 'close', None)
+            if close is not None:
+                close()
+
+    def __iter__(self):
+        out = deque()
+        push, flushes = self._compile(lambda item: out.append(item) or True)
+        source = iter(self._source)
+        try:
+            for item in source:
+                more = push(item)
+                while out:
+                    yield out.popleft()
+                if not more:
+                    break
+            for flush in flushes:
+                flush()
+                while out:
+                    yield out.popleft()
+        finally:
+            close = getattr(source, 'close', None)
+            if close is not None:
+                close()
+
+    def reduce(self, function, initial=_MISSING):
+        """Folds the pipeline's output with function(acc, item)"""
+        state = {'acc': initial}
+
+        def sink(item):
+            if state['acc'] is _MISSING:
+                state['acc'] = item
+            else:
+                state['acc'] = function(state['acc'], item)
+            return True
+
+        self._run(sink)
+        if state['acc'] is _MISSING:
+            raise TypeError("reduce() of an empty pipeline with no initial")
+        return state['acc']
+
+    def collect(self):
+        return list(self)
+
+    def stats(self):
+        """Per-stage rows in/out (and seconds when profiling) of the last run"""
+        return [stats.as_dict() for stats in self._stats]
@@ -0,0 +1,210 @@
+#!/usr/bin/python3
+"""Connection pool shared by the user_data generators."""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import seed
+
+
+def _is_healthy(connection):
+    """Checks that a pooled connection can still talk to the server"""
+    try:
+        if hasattr(connection, 'is_connected'):
+            return connection.is_connected()
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """Fixed-size pool of database connections.
+
+    Connections are health checked on checkout and recycled once they are
+    older than `recycle` seconds. `stats()` reports how often a checkout
+    was served from the pool and how long callers waited for one.
+    """
+
+    def __init__(self, connect=None, size=5, recycle=3600, timeout=30):
+        self._connect = connect or seed.connect_to_prodev
+        self.size = size
+        self.recycle = recycle
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._created_at = {}
+        self._stats = {
+            'checkouts': 0,
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'recycled': 0,
+            'discarded': 0,
+        }
+
+    @property
+    def connect(self):
+        """Factory the pool opens connections with"""
+        return self._connect
+
+    def _new_connection(self):
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+            raise
+        if not connection:
+            with self._lock:
+                self._open -= 1
+            return None
+        return connection, time.monotonic()
+
+    def _discard(self, connection, reason):
+        _close_quietly(connection)
+        with self._lock:
+            self._open -= 1
+            self._stats[reason] += 1
+
+    def acquire(self):
+        """Checks a connection out, waiting up to `timeout` seconds"""
+        started = time.monotonic()
+        waited = False
+        while True:
+            try:
+                connection, created = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._open < self.size
+                    if can_open:
+                        self._open += 1
+                if can_open:
+                    entry = self._new_connection()
+                    hit = False
+                    break
+                waited = True
+                remaining = self.timeout - (time.monotonic() - started)
+                try:
+                    connection, created = self._idle.get(
+                        timeout=max(remaining, 0))
+                except queue.Empty:
+                    raise TimeoutError(
+                        "No pooled connection available after "
+                        f"{self.timeout}s") from None
+
+            if time.monotonic() - created > self.recycle:
+                self._discard(connection, 'recycled')
+                continue
+            if not _is_healthy(connection):
+                self._discard(connection, 'discarded')
+                continue
+            entry = connection, created
+            hit = True
+            break
+
+        wait = time.monotonic() - started
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['hits' if hit else 'misses'] += 1
+            if waited:
+                self._stats['waits'] += 1
+            self._stats['wait_time'] += wait
+            self._stats['max_wait_time'] = max(
+                self._stats['max_wait_time'], wait)
+        if entry is None:
+            return None
+        connection, created = entry
+        with self._lock:
+            self._created_at[id(connection)] = created
+        return connection
+
+    def release(self, connection):
+        """Returns a connection, rolling back whatever it left open"""
+        with self._lock:
+            created = self._created_at.pop(id(connection), time.monotonic())
+        try:
+            connection.rollback()
+        except Exception:
+            self._discard(connection, 'discarded')
+            return
+        self._idle.put((connection, created))
+
+    @contextmanager
+    def connection(self):
+        """Context manager form of acquire()/release()"""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            if connection:
+                self.release(connection)
+
+    def stats(self):
+        """Snapshot of pool counters for sizing the pool under load"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open'] = self._open
+        stats['idle'] = self._idle.qsize()
+        stats['in_use'] = stats['open'] - stats['idle']
+        stats['size'] = self.size
+        if stats['checkouts']:
+            stats['hit_rate'] = stats['hits'] / stats['checkouts']
+            stats['avg_wait_time'] = stats['wait_time'] / stats['checkouts']
+        else:
+            stats['hit_rate'] = 0.0
+            stats['avg_wait_time'] = 0.0
+        return stats
+
+    def close(self):
+        """Closes every idle connection"""
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            _close_quietly(connection)
+            with self._lock:
+                self._open -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure(**kwargs):
+    """Replaces the shared pool, e.g. configure(size=10, recycle=600)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(**kwargs)
+    return _pool
+
+
+def get_pool():
+    """Returns the shared pool, creating it with defaults on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def connection():
+    """Borrows a connection from the shared pool"""
+    return get_pool().connection()
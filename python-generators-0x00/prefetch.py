@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+"""Background read-ahead for the page/batch generators.
+
+    for page in read_ahead(lazy_paginate(100), depth=3):
+        ...
+
+The wrapped generator runs on a worker thread that keeps up to `depth`
+items (and optionally at most `max_bytes` of them) queued ahead of the
+consumer, so the next page is fetched while the current one is being
+processed. Stopping early closes the wrapped generator, which returns
+its pooled connection.
+"""
+import sys
+import threading
+from collections import deque
+
+_DONE = object()
+
+
+def approx_size(item):
+    """Rough in-memory size of a page/batch of row dicts or tuples"""
+    size = sys.getsizeof(item)
+    for row in item:
+        size += sys.getsizeof(row)
+        values = row.values() if isinstance(row, dict) else row
+        size += sum(sys.getsizeof(value) for value in values)
+    return size
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def read_ahead(source, depth=2, max_bytes=None, sizeof=approx_size):
+    """Generator that yields source's items, prefetched on a thread.
+
+    At least one item is always allowed in flight, even if it alone is
+    larger than max_bytes.
+    """
+    if depth < 1:
+        raise ValueError("depth must be at least 1")
+    buffered = deque()
+    state = {'bytes': 0, 'stopped': False}
+    ready = threading.Condition()
+
+    def has_room(size):
+        if len(buffered) >= depth:
+            return False
+        if max_bytes is None or not buffered:
+            return True
+        return state['bytes'] + size <= max_bytes
+
+    def produce():
+        iterator = iter(source)
+        try:
+            for item in iterator:
+                size = sizeof(item) if max_bytes is not None else 0
+                with ready:
+                    ready.wait_for(
+                        lambda: state['stopped'] or has_room(size))
+                    if state['stopped']:
+                        break
+                    buffered.append((item, size))
+                    state['bytes'] += size
+                    ready.notify_all()
+            outcome = _DONE
+        except Exception as err:
+            outcome = _Failure(err)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+        with ready:
+            buffered.append((outcome, 0))
+            ready.notify_all()
+
+    worker = threading.Thread(target=produce, name='read-ahead', daemon=True)
+    worker.start()
+    try:
+        while True:
+            with ready:
+                ready.wait_for(lambda: buffered)
+                item, size = buffered.popleft()
+                state['bytes'] -= size
+                ready.notify_all()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        with ready:
+            state['stopped'] = True
+            ready.notify_all()
+        worker.join()
@@ -1,6 +1,18 @@
 import mysql.connector
 import csv
+import os
+import sqlite3
+import time
 import uuid
+from decimal import Decimal
+
+from bloom import BloomFilter
+
+# Namespace for deterministic user_data keys derived from email
+USER_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, 'user_data.alx-prodev')
+
+# SQL form of normalize_email, indexed by idx_user_data_email_key
+EMAIL_KEY = "LOWER(email)"
 
 def connect_db():
     try:
@@ -30,21 +42,137 @@ def connect_to_prodev():
         print(f"Connection to ALX_prodev failed: {err}")
         return None
 
+def connect_sqlite(db_path='ALX_prodev.db'):
+    """SQLite stand-in for ALX_prodev, for benchmarking without MySQL"""
+    return sqlite3.connect(db_path, check_same_thread=False)
+
+def is_sqlite(connection):
+    return isinstance(connection, sqlite3.Connection)
+
+def placeholder(connection):
+    """Bind parameter marker for the connection's driver"""
+    return '?' if is_sqlite(connection) else '%s'
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+def open_cursor(connection, dictionary=True, buffered=False):
+    """Cursor yielding dict (or tuple) rows on MySQL and the SQLite stand-in.
+
+    buffered=False streams the result set from the server instead of
+    pulling it all client-side on execute.
+    """
+    if is_sqlite(connection):
+        cursor = connection.cursor()
+        if dictionary:
+            cursor.row_factory = _dict_row
+        return cursor
+    return connection.cursor(buffered=buffered, dictionary=dictionary)
+
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
 def create_table(connection):
     cursor = connection.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_data (
-            user_id VARCHAR(36) PRIMARY KEY,
-            name VARCHAR(255) NOT NULL,
-            email VARCHAR(255) NOT NULL,
-            age DECIMAL NOT NULL,
-            INDEX(user_id)
-        );
-    """)
+    if is_sqlite(connection):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS user_data (
+                user_id VARCHAR(36) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                email VARCHAR(255) NOT NULL,
+                age DECIMAL NOT NULL,
+                updated_at TEXT NOT NULL DEFAULT ({SQLITE_NOW})
+            );
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_data (
+                user_id VARCHAR(36) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                email VARCHAR(255) NOT NULL,
+                age DECIMAL NOT NULL,
+                updated_at TIMESTAMP(6) NOT NULL
+                    DEFAULT CURRENT_TIMESTAMP(6)
+                    ON UPDATE CURRENT_TIMESTAMP(6),
+                INDEX idx_user_data_updated_at (updated_at, user_id)
+            );
+        """)
+    add_email_index(connection, cursor)
+    add_change_tracking(connection, cursor)
     connection.commit()
     print("Table user_data created successfully")
     cursor.close()
 
+def add_email_index(connection, cursor):
+    """Indexes the normalized email (EMAIL_KEY) of a user_data table
+
+    Replaces the case-sensitive plain email index earlier versions made;
+    on MySQL (8.0.13+ for the functional index) it also drops the
+    INDEX(user_id) older tables carry, which only duplicated the
+    primary key.
+    """
+    if is_sqlite(connection):
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_user_data_email_key "
+            f"ON user_data ({EMAIL_KEY})")
+        cursor.execute("DROP INDEX IF EXISTS idx_user_data_email")
+        return
+    cursor.execute("SHOW INDEX FROM user_data")
+    names = {row[2] for row in cursor.fetchall()}
+    if 'idx_user_data_email_key' not in names:
+        cursor.execute("ALTER TABLE user_data ADD INDEX "
+                       f"idx_user_data_email_key (({EMAIL_KEY}))")
+    if 'idx_user_data_email' in names:
+        cursor.execute("ALTER TABLE user_data DROP INDEX idx_user_data_email")
+    if 'user_id' in names:
+        cursor.execute("ALTER TABLE user_data DROP INDEX user_id")
+
+def add_change_tracking(connection, cursor):
+    """Adds the indexed updated_at column to a user_data table lacking it
+
+    New and updated rows get a fresh updated_at, which lets
+    stream_user_changes read only what changed since a watermark.
+    """
+    if is_sqlite(connection):
+        cursor.execute("PRAGMA table_info(user_data)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'updated_at' not in columns:
+            # SQLite can't ALTER in a non-constant default, stamp inserts
+            cursor.execute("""
+                ALTER TABLE user_data ADD COLUMN updated_at TEXT NOT NULL
+                DEFAULT '1970-01-01 00:00:00.000'
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS user_data_insert_stamp
+                AFTER INSERT ON user_data
+                BEGIN
+                    UPDATE user_data SET updated_at = {SQLITE_NOW}
+                    WHERE user_id = NEW.user_id;
+                END;
+            """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS user_data_update_stamp
+            AFTER UPDATE OF name, email, age ON user_data
+            BEGIN
+                UPDATE user_data SET updated_at = {SQLITE_NOW}
+                WHERE user_id = NEW.user_id;
+            END;
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_user_data_updated_at
+            ON user_data (updated_at, user_id)
+        """)
+        return
+
+    cursor.execute("SHOW COLUMNS FROM user_data LIKE 'updated_at'")
+    if not cursor.fetchall():
+        cursor.execute("""
+            ALTER TABLE user_data
+            ADD COLUMN updated_at TIMESTAMP(6) NOT NULL
+                DEFAULT CURRENT_TIMESTAMP(6)
+                ON UPDATE CURRENT_TIMESTAMP(6),
+            ADD INDEX idx_user_data_updated_at (updated_at, user_id)
+        """)
+
 def insert_data(connection, file_path):
     cursor = connection.cursor()
     with open(file_path, 'r') as csvfile:
@@ -61,4 +189,157 @@ def insert_data(connection, file_path):
     connection.commit()
     cursor.close()
 
+def normalize_email(email):
+    """Python form of EMAIL_KEY; stored emails are assumed trimmed"""
+    return email.strip().lower()
+
+def user_key(email):
+    """Deterministic user_id for an email, stable across seed runs"""
+    return str(uuid.uuid5(USER_NAMESPACE, normalize_email(email)))
+
+def read_csv_chunks(file_path, chunk_size=1000, deterministic=False):
+    """Streams the CSV as lists of ready-to-insert user_data tuples.
+
+    deterministic=True derives user_id from the email instead of uuid4.
+    """
+    with open(file_path, 'r', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return
+        name_at = header.index('name')
+        email_at = header.index('email')
+        age_at = header.index('age')
+
+        chunk = []
+        for row in reader:
+            email = row[email_at]
+            user_id = user_key(email) if deterministic else str(uuid.uuid4())
+            chunk.append((user_id, row[name_at], email, row[age_at]))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def insert_rows_bulk(connection, chunks):
+    """Inserts each chunk with one executemany and commits per chunk.
+
+    Returns (rows inserted, elapsed seconds).
+    """
+    mark = placeholder(connection)
+    query = (
+        "INSERT INTO user_data (user_id, name, email, age) "
+        f"VALUES ({mark}, {mark}, {mark}, {mark})"
+    )
+    cursor = connection.cursor()
+    total = 0
+    started = time.perf_counter()
+    try:
+        for chunk in chunks:
+            cursor.executemany(query, chunk)
+            connection.commit()
+            total += len(chunk)
+    finally:
+        cursor.close()
+    return total, time.perf_counter() - started
+
+def insert_data_bulk(connection, file_path, chunk_size=1000):
+    """Bulk loads the CSV in chunks of chunk_size rows and reports rows/sec"""
+    total, elapsed = insert_rows_bulk(
+        connection, read_csv_chunks(file_path, chunk_size))
+    rate = total / elapsed if elapsed else 0.0
+    print(f"Inserted {total} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    return total
+
+def _same_user(stored, row):
+    return (stored[1] == row[1] and stored[2] == row[2]
+            and Decimal(str(stored[3])) == Decimal(str(row[3])))
+
+def _last_rows(file_path, chunk_size=1000):
+    """Maps user_id -> index of its last CSV row, for ids seen twice.
+
+    One pass with a Bloom filter of the ids seen so far: only ids it
+    reports as seen (repeats, plus a few false positives, which map to
+    their only row) are kept, so memory stays far below one entry per
+    row.
+    """
+    # CSV rows are well over 16 bytes, so this bounds the row count
+    seen = BloomFilter(os.path.getsize(file_path) // 16 + 1, 0.001)
+    last = {}
+    index = 0
+    for chunk in read_csv_chunks(file_path, chunk_size, deterministic=True):
+        for row in chunk:
+            if row[0] in seen:
+                last[row[0]] = index
+            else:
+                seen.add(row[0])
+            index += 1
+    return last
+
+def insert_data_incremental(connection, file_path, chunk_size=1000,
+                            bloom=None):
+    """Re-seeds idempotently, touching only rows that are new or changed.
+
+    Rows are keyed by user_key(email), so running this twice over the same
+    CSV changes nothing the second time. An email repeated anywhere in
+    the file resolves to its last row (found by a first pass over the
+    file); earlier rows for it are skipped. Tables first loaded with random
+    uuid4 keys are not matched and should be reloaded once this way.
+    With a Bloom filter of the stored emails (normalize_email form, see
+    user_lookup.build_email_bloom) rows it rules out are inserted without
+    asking the database; inserted emails are added to it.
+    Returns a dict of inserted/updated/skipped counts.
+    """
+    mark = placeholder(connection)
+    insert_query = (
+        "INSERT INTO user_data (user_id, name, email, age) "
+        f"VALUES ({mark}, {mark}, {mark}, {mark})"
+    )
+    update_query = (
+        f"UPDATE user_data SET name = {mark}, email = {mark}, age = {mark} "
+        f"WHERE user_id = {mark}"
+    )
+    counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    last = _last_rows(file_path, chunk_size)
+    index = 0
+    cursor = connection.cursor()
+    try:
+        for chunk in read_csv_chunks(file_path, chunk_size,
+                                     deterministic=True):
+            # The last row of a repeated email wins, as it would row by row
+            rows = {}
+            for row in chunk:
+                if last.get(row[0], index) == index:
+                    rows[row[0]] = row
+                index += 1
+            counts['skipped'] += len(chunk) - len(rows)
+            candidates = [key for key, row in rows.items()
+                          if bloom is None or normalize_email(row[2]) in bloom]
+            stored = {}
+            if candidates:
+                marks = ', '.join([mark] * len(candidates))
+                cursor.execute(
+                    "SELECT user_id, name, email, age FROM user_data "
+                    f"WHERE user_id IN ({marks})", tuple(candidates))
+                stored = {found[0]: found for found in cursor.fetchall()}
 
+            new = [row for key, row in rows.items() if key not in stored]
+            changed = [(row[1], row[2], row[3], key)
+                       for key, row in rows.items()
+                       if key in stored and not _same_user(stored[key], row)]
+            if new:
+                cursor.executemany(insert_query, new)
+            if changed:
+                cursor.executemany(update_query, changed)
+            connection.commit()
+            if bloom is not None:
+                bloom.update(normalize_email(row[2]) for row in new)
+            counts['inserted'] += len(new)
+            counts['updated'] += len(changed)
+            counts['skipped'] += len(rows) - len(new) - len(changed)
+    finally:
+        cursor.close()
+    print(f"Inserted {counts['inserted']}, updated {counts['updated']}, "
+          f"skipped {counts['skipped']} rows")
+    return counts
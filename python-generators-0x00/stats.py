@@ -0,0 +1,238 @@
+#!/usr/bin/python3
+"""Single-pass, mergeable statistics over streams of numbers.
+
+StreamingStats keeps count/mean/variance (Welford, folded chunk by chunk
+with Chan's formula), min/max and a TDigest for approximate percentiles.
+Partial results from separate streams combine with merge().
+"""
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TDigest:
+    """Merging t-digest sketch for approximate quantiles.
+
+    Memory is bounded by roughly `compression` centroids no matter how
+    many values are added; accuracy is best near the tails.
+    """
+
+    def __init__(self, compression=100, buffer_size=None):
+        self.compression = compression
+        self.buffer_size = buffer_size or 5 * compression
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._centroids = []
+        self._buffer = []
+        self._incoming = []  # centroids of merged digests, not yet folded
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inverse(self, k):
+        return (math.sin(2 * math.pi * k / self.compression) + 1) / 2
+
+    def _next_limit(self, cumulative):
+        q = min(cumulative / self.count, 1.0)
+        return self.count * self._k_inverse(self._k(q) + 1)
+
+    def _compress(self):
+        """Folds buffered values and merged centroids into the sketch"""
+        points = self._centroids + self._incoming
+        self._incoming = []
+        if self._buffer:
+            self._extend_range(min(self._buffer), max(self._buffer))
+            points.extend((value, 1) for value in self._buffer)
+            self._buffer = []
+        if not points:
+            return
+        points.sort()
+
+        merged = []
+        mean, weight = points[0]
+        cumulative = 0
+        limit = self._next_limit(0)
+        for next_mean, next_weight in points[1:]:
+            if cumulative + weight + next_weight <= limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                merged.append((mean, weight))
+                cumulative += weight
+                limit = self._next_limit(cumulative)
+                mean, weight = next_mean, next_weight
+        merged.append((mean, weight))
+        self._centroids = merged
+
+    def _extend_range(self, low, high):
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def update(self, values):
+        """Adds every value of a chunk"""
+        before = len(self._buffer)
+        self._buffer.extend(values)
+        self.count += len(self._buffer) - before
+        if len(self._buffer) >= self.buffer_size:
+            self._compress()
+
+    def add(self, value):
+        self._buffer.append(value)
+        self.count += 1
+        if len(self._buffer) >= self.buffer_size:
+            self._compress()
+
+    def merge(self, other):
+        """Folds another digest into this one"""
+        other._compress()
+        if not other.count:
+            return self
+        self.count += other.count
+        self._extend_range(other.min, other.max)
+        # Buffered like added values: folding many small digests in one
+        # pass loses less than recompressing after each of them
+        self._incoming.extend(other._centroids)
+        if len(self._buffer) + len(self._incoming) >= self.buffer_size:
+            self._compress()
+        return self
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0..1), None when empty
+
+        Each centroid's weight is taken to be spread evenly around its
+        mean, and single values sit exactly on theirs. Below the first
+        and above the last centroid center, values run out to the
+        exact min and max.
+        """
+        self._compress()
+        centroids = self._centroids
+        if not centroids:
+            return None
+        target = q * self.count
+        if target < 1:
+            return self.min
+        if target > self.count - 1:
+            return self.max
+
+        mean, weight = centroids[0]
+        if weight > 1 and target < weight / 2:
+            return self.min + (target - 1) / (weight / 2 - 1) * (
+                mean - self.min)
+        cumulative = weight / 2  # rank of the first centroid's center
+        for next_mean, next_weight in centroids[1:]:
+            gap = (weight + next_weight) / 2
+            if cumulative + gap > target:
+                # A single value owns the half unit of rank around it
+                left = 0.5 if weight == 1 else 0
+                right = 0.5 if next_weight == 1 else 0
+                if weight == 1 and target - cumulative < 0.5:
+                    return mean
+                if next_weight == 1 and cumulative + gap - target <= 0.5:
+                    return next_mean
+                before = target - cumulative - left
+                after = cumulative + gap - target - right
+                return (mean * after + next_mean * before) / (before + after)
+            cumulative += gap
+            mean, weight = next_mean, next_weight
+
+        # Past the last center: run out to max over the last half weight
+        if weight > 1:
+            after = self.count - target - 1
+            half = weight / 2 - 1
+            if half > 0:
+                return self.max - after / half * (self.max - mean)
+        return self.max
+
+
+class StreamingStats:
+    """Count, mean, variance, min/max and percentiles in one pass.
+
+    Feed it chunks with update(); partial results from other streams are
+    combined with merge(), so scans can be split and reduced.
+    """
+
+    def __init__(self, compression=100):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.digest = TDigest(compression)
+
+    def _combine(self, count, mean, m2, low, high):
+        """Chan et al. pairwise update of the running moments"""
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def update(self, values):
+        """Adds a chunk of numbers (a list, array('d') or numpy array)"""
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            if not len(values):
+                return self
+            values = values.astype(numpy.float64, copy=False)
+            mean = float(values.mean())
+            m2 = float(numpy.square(values - mean).sum())
+            self._combine(len(values), mean, m2,
+                          float(values.min()), float(values.max()))
+            self.digest.update(values.tolist())
+            return self
+
+        values = [float(value) for value in values]
+        if not values:
+            return self
+        count = len(values)
+        mean = math.fsum(values) / count
+        m2 = math.fsum([(value - mean) ** 2 for value in values])
+        self._combine(count, mean, m2, min(values), max(values))
+        self.digest.update(values)
+        return self
+
+    def add(self, value):
+        return self.update((value,))
+
+    def merge(self, other):
+        """Folds another StreamingStats into this one"""
+        self._combine(other.count, other.mean, other._m2, other.min, other.max)
+        self.digest.merge(other.digest)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance"""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def sample_variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+    def percentile(self, p):
+        """Approximate p-th percentile (0..100)"""
+        return self.digest.quantile(p / 100)
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'variance': self.variance,
+            'stdev': self.stdev,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
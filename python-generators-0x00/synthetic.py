@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+"""Deterministic synthetic user_data for load testing.
+
+    python3 synthetic.py 10000000 --csv users_10m.csv
+    python3 synthetic.py 1000000 --sqlite bench.db
+
+Rows come from a seeded random.Random, so a given seed and chunk size
+always produce the same users in the same order. Each chunk is built
+from bulk draws (one choices() call per column) and then written
+straight to CSV or loaded through seed.insert_rows_bulk. First and last
+names are drawn from the bundled user_data.csv so name lengths look like
+the real data.
+"""
+import argparse
+import csv
+import os
+import random
+import time
+
+import seed
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'user_data.csv')
+
+# Share of addresses per domain, roughly matching consumer mail providers
+EMAIL_DOMAINS = {
+    'gmail.com': 45,
+    'yahoo.com': 18,
+    'hotmail.com': 15,
+    'outlook.com': 10,
+    'icloud.com': 6,
+    'aol.com': 3,
+    'protonmail.com': 2,
+    'example.org': 1,
+}
+
+# Every local part ends in the row number. Sampled names contain no
+# digits, so that trailing number alone keeps each address unique.
+EMAIL_PATTERNS = (
+    lambda first, last, n: f"{first}.{last}{n}",
+    lambda first, last, n: f"{first}_{last}{n}",
+    lambda first, last, n: f"{first}.{last}.{n}",
+    lambda first, last, n: f"{first}{n}",
+    lambda first, last, n: f"{last}.{first}{n}",
+)
+
+NAME_AFFIXES = {'Mr.', 'Mrs.', 'Ms.', 'Miss', 'Dr.', 'Jr.', 'Sr.', 'II',
+                'III', 'IV', 'V', 'MD', 'DDS', 'DVM', 'PhD'}
+
+# Version 4 / RFC 4122 variant bits of a random 128-bit UUID
+UUID_CLEAR = ~((0xf000 << 64) | (0xc000 << 48))
+UUID_SET = (0x4000 << 64) | (0x8000 << 48)
+
+# Piecewise age distribution: (low, high, weight)
+AGE_BANDS = ((1, 17, 18), (18, 34, 30), (35, 54, 28), (55, 74, 18),
+             (75, 100, 6))
+
+
+def _sample_names(path=SAMPLE_CSV):
+    first_names, last_names = set(), set()
+    with open(path, 'r', newline='') as csvfile:
+        for row in csv.DictReader(csvfile):
+            parts = [part for part in row['name'].split()
+                     if part not in NAME_AFFIXES
+                     and not any(c.isdigit() for c in part)]
+            if len(parts) >= 2:
+                first_names.add(parts[0])
+                last_names.add(parts[-1])
+    return sorted(first_names), sorted(last_names)
+
+
+def _uuid4_string(bits):
+    text = '%032x' % (bits & UUID_CLEAR | UUID_SET)
+    return (f"{text[:8]}-{text[8:12]}-{text[12:16]}-{text[16:20]}-"
+            f"{text[20:]}")
+
+
+def generate_users(count, seed_value=0, chunk_size=10000):
+    """Generator that yields chunks of (user_id, name, email, age) tuples
+
+    Every chunk draws chunk_size rows (the last one is trimmed), so the
+    first N users are the same whatever the total count. Emails are
+    unique: each local part carries the row's position in the stream.
+    """
+    rng = random.Random(seed_value)
+    first_names, last_names = _sample_names()
+    domains = list(EMAIL_DOMAINS)
+    domain_weights = list(EMAIL_DOMAINS.values())
+    bands = [(low, high) for low, high, _ in AGE_BANDS]
+    band_weights = [weight for _, _, weight in AGE_BANDS]
+
+    produced = 0
+    while produced < count:
+        firsts = rng.choices(first_names, k=chunk_size)
+        lasts = rng.choices(last_names, k=chunk_size)
+        patterns = rng.choices(EMAIL_PATTERNS, k=chunk_size)
+        mail_domains = rng.choices(domains, domain_weights, k=chunk_size)
+        age_bands = rng.choices(bands, band_weights, k=chunk_size)
+        ids = [rng.getrandbits(128) for _ in range(chunk_size)]
+        offsets = [rng.random() for _ in range(chunk_size)]
+
+        chunk = []
+        for i in range(min(chunk_size, count - produced)):
+            first, last = firsts[i], lasts[i]
+            low, high = age_bands[i]
+            local = patterns[i](first, last, produced + i + 1)
+            chunk.append((
+                _uuid4_string(ids[i]),
+                f"{first} {last}",
+                f"{local}@{mail_domains[i]}",
+                low + int(offsets[i] * (high - low + 1)),
+            ))
+        produced += len(chunk)
+        yield chunk
+
+
+def write_csv(path, count, seed_value=0, chunk_size=10000):
+    """Writes `count` synthetic users in the user_data.csv format"""
+    with open(path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+        writer.writerow(('name', 'email', 'age'))
+        for chunk in generate_users(count, seed_value, chunk_size):
+            writer.writerows(row[1:] for row in chunk)
+
+
+def load_database(connection, count, seed_value=0, chunk_size=10000):
+    """Loads `count` synthetic users through the bulk insert path"""
+    total, elapsed = seed.insert_rows_bulk(
+        connection, generate_users(count, seed_value, chunk_size))
+    rate = total / elapsed if elapsed else 0.0
+    print(f"Inserted {total} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--csv', help="write a CSV file")
+    target.add_argument('--sqlite', help="load an SQLite stand-in database")
+    target.add_argument('--mysql', action='store_true',
+                        help="load ALX_prodev.user_data")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.csv:
+        write_csv(args.csv, args.rows, args.seed, args.chunk_size)
+        elapsed = time.perf_counter() - started
+        print(f"Wrote {args.rows} rows in {elapsed:.2f}s")
+        return
+    connection = (seed.connect_sqlite(args.sqlite) if args.sqlite
+                  else seed.connect_to_prodev())
+    seed.create_table(connection)
+    load_database(connection, args.rows, args.seed, args.chunk_size)
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Unit tests for aggregate.py module.
+Covers pushdown, streaming, spilling and partitioned group-bys agreeing.
+"""
+
+import functools
+import os
+import tempfile
+import unittest
+from parameterized import parameterized
+
+import aggregate
+import pool
+import seed
+import synthetic
+
+
+def _rounded(groups):
+    return {key: {name: round(value, 6) for name, value in summary.items()}
+            for key, summary in groups.items()}
+
+
+class TestAggregateUsers(unittest.TestCase):
+    """Test cases for aggregate_users across execution strategies."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Loads 3000 synthetic users behind the shared pool."""
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, 'users.db')
+        connection = seed.connect_sqlite(path)
+        seed.create_table(connection)
+        seed.insert_rows_bulk(connection,
+                              synthetic.generate_users(3000, chunk_size=1000))
+        connection.close()
+        pool.configure(connect=functools.partial(seed.connect_sqlite, path),
+                       size=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Closes the pool and removes the database."""
+        pool.get_pool().close()
+        cls.tmp.cleanup()
+
+    @parameterized.expand([
+        ("email_domain_streamed", 'email_domain', {'pushdown': False}),
+        ("email_domain_spilled", 'email_domain',
+         {'pushdown': False, 'max_groups': 2, 'batch_size': 100}),
+        ("email_domain_partitioned", 'email_domain',
+         {'pushdown': False, 'partitions': 3, 'batch_size': 500}),
+        ("age_decile_streamed", 'age_decile', {'pushdown': False}),
+        ("age_decile_spilled", 'age_decile',
+         {'pushdown': False, 'max_groups': 3, 'batch_size': 100}),
+        ("age_decile_partitioned", 'age_decile',
+         {'pushdown': False, 'partitions': 3, 'max_groups': 3,
+          'batch_size': 500}),
+    ])
+    def test_matches_pushdown(self, _, key, options):
+        """Test that every strategy gives the pushed-down GROUP BY."""
+        expected = _rounded(aggregate.aggregate_users(key))
+        self.assertEqual(sum(group['count'] for group in expected.values()),
+                         3000)
+        self.assertEqual(_rounded(aggregate.aggregate_users(key, **options)),
+                         expected)
+
+    def test_callable_key(self):
+        """Test that a callable key streams like its named equivalent."""
+        self.assertEqual(
+            _rounded(aggregate.aggregate_users(aggregate.age_decile)),
+            _rounded(aggregate.aggregate_users('age_decile')))
+
+    def test_spill_files_merge(self):
+        """Test that spilled and in-memory groups merge per partition."""
+        rows = [{'email': f"u{n}@d{n % 5}.com", 'age': n} for n in range(50)]
+        spill_dir = tempfile.mkdtemp(dir=self.tmp.name)
+        left = aggregate.GroupBy('email_domain', max_groups=2,
+                                 spill_dir=spill_dir).add_batch(rows[:25])
+        right = aggregate.GroupBy('email_domain').add_batch(rows[25:])
+        self.assertTrue(left.spilled)
+        merged = left.merge(right).to_dict()
+        self.assertEqual(merged['d1.com'],
+                         {'count': 10, 'sum': 235.0, 'mean': 23.5,
+                          'min': 1.0, 'max': 46.0})
+        left.close()
+        self.assertEqual(os.listdir(spill_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
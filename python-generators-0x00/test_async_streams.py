@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Unit tests for async_streams.py module.
+Covers prefetch backpressure, early exit and concurrent scans on one loop.
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+import async_streams
+import seed
+
+IDS = [f"id-{n:03d}" for n in range(100)]
+
+
+class TestPrefetched(unittest.TestCase):
+    """Test cases for the bounded producer queue."""
+
+    def test_slow_consumer_pauses_fetcher(self):
+        """Test that fetching stops `prefetch` batches ahead."""
+        calls = []
+
+        async def fetch():
+            calls.append(len(calls))
+            return [len(calls)] if len(calls) <= 20 else []
+
+        async def main():
+            batches = async_streams._prefetched(fetch, 3)
+            first = await batches.__anext__()
+            for _ in range(10):
+                await asyncio.sleep(0)
+            ahead = len(calls)
+            rest = [batch async for batch in batches]
+            return first, ahead, rest
+
+        first, ahead, rest = asyncio.run(main())
+        self.assertEqual(first, [1])
+        # 3 queued, plus the one fetched that is waiting for room
+        self.assertEqual(ahead, 1 + 3 + 1)
+        self.assertEqual(rest, [[n] for n in range(2, 21)])
+
+    def test_error_reaches_consumer(self):
+        """Test that a failing fetch is raised to the consumer."""
+        async def fetch():
+            raise ValueError("boom")
+
+        async def main():
+            return [batch async for batch in
+                    async_streams._prefetched(fetch, 2)]
+
+        with self.assertRaises(ValueError):
+            asyncio.run(main())
+
+
+class TestAsyncStreams(unittest.TestCase):
+    """Test cases for the aiosqlite-backed streams."""
+
+    def setUp(self):
+        """Creates 100 users and a connect() that records connections."""
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, 'users.db')
+        connection = seed.connect_sqlite(path)
+        seed.create_table(connection)
+        connection.executemany(
+            "INSERT INTO user_data (user_id, name, email, age) "
+            "VALUES (?, ?, ?, ?)",
+            [(user_id, f"User {n}", f"user{n}@example.com", 20 + n % 50)
+             for n, user_id in enumerate(IDS)])
+        connection.commit()
+        connection.close()
+        self.connections = []
+        sqlite_connect = async_streams.sqlite_connector(path)
+
+        async def connect():
+            connection = await sqlite_connect()
+            self.connections.append(connection)
+            return connection
+        self.connect = connect
+
+    def tearDown(self):
+        """Removes the database."""
+        self.tmp.cleanup()
+
+    def _closed(self):
+        return [connection._connection is None
+                for connection in self.connections]
+
+    def test_concurrent_scans_interleave(self):
+        """Test that scans sharing a loop make progress together."""
+        order = []
+
+        async def scan(name, batches):
+            ids = []
+            async for batch in batches:
+                order.append(name)
+                ids.extend(user['user_id'] for user in batch)
+            return ids
+
+        async def main():
+            return await asyncio.gather(
+                scan('batches', async_streams.async_stream_users_in_batches(
+                    10, self.connect, prefetch=2)),
+                scan('pages', async_streams.async_lazy_paginate(
+                    10, self.connect, prefetch=2)))
+
+        batched, paged = asyncio.run(main())
+        self.assertEqual(sorted(batched), IDS)
+        self.assertEqual(paged, IDS)
+        self.assertEqual(self._closed(), [True, True])
+        # Neither scan ran to completion before the other started
+        self.assertEqual(set(order[:len(order) // 2]), {'batches', 'pages'})
+
+    def test_rows_stream(self):
+        """Test that async_stream_users yields every row once."""
+        async def main():
+            return [user['user_id'] async for user in
+                    async_streams.async_stream_users(self.connect,
+                                                     arraysize=7)]
+
+        self.assertEqual(sorted(asyncio.run(main())), IDS)
+        self.assertEqual(self._closed(), [True])
+
+    def test_early_close_closes_connection(self):
+        """Test that leaving a stream early closes its connection."""
+        async def main():
+            users = async_streams.async_stream_users(self.connect,
+                                                     arraysize=5)
+            first = await users.__anext__()
+            await users.aclose()
+            # Checked before asyncio.run finalizes leftover generators
+            return first, self._closed(), len(asyncio.all_tasks())
+
+        first, closed, tasks = asyncio.run(main())
+        self.assertIn(first['user_id'], IDS)
+        self.assertEqual(closed, [True])
+        self.assertEqual(tasks, 1)  # no producer left running
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Unit tests for 1-batch_processing.py module.
+Covers the batch_processing modes and their option combinations.
+"""
+
+import ast
+import contextlib
+import functools
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+from parameterized import parameterized
+
+import pool
+import seed
+
+batch_query = __import__('1-batch_processing')
+
+
+class UserDataTestCase(unittest.TestCase):
+    """Base fixture: twelve users aged 20 to 31 behind the shared pool."""
+
+    def setUp(self):
+        """Creates a SQLite user_data table behind the shared pool."""
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, 'users.db')
+        connection = seed.connect_sqlite(path)
+        seed.create_table(connection)
+        connection.executemany(
+            "INSERT INTO user_data (user_id, name, email, age) "
+            "VALUES (?, ?, ?, ?)",
+            [(f"id-{n:02d}", f"User {n}", f"user{n}@example.com", 20 + n)
+             for n in range(12)])
+        connection.commit()
+        connection.close()
+        pool.configure(connect=functools.partial(seed.connect_sqlite, path),
+                       size=1)
+
+    def tearDown(self):
+        """Closes the pool and removes the database."""
+        pool.get_pool().close()
+        self.tmp.cleanup()
+
+
+class TestBatchProcessing(UserDataTestCase):
+    """Test cases for batch_processing."""
+
+    def _printed(self, **options):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            batch_query.batch_processing(5, **options)
+        return sorted(ast.literal_eval(line)['user_id']
+                      for line in out.getvalue().splitlines())
+
+    @parameterized.expand([
+        ("pushdown_columnar", {'columnar': True}),
+        ("columnar", {'pushdown': False, 'columnar': True}),
+        ("filter_in_python", {'pushdown': False}),
+    ])
+    def test_modes_agree(self, _, options):
+        """Test that every mode prints the same users over 25."""
+        expected = self._printed()
+        self.assertEqual(len(expected), 6)
+        self.assertEqual(self._printed(**options), expected)
+
+    @parameterized.expand([
+        ("partitions", {'partitions': 2}),
+        ("checkpoint", {'checkpoint': 'unused.json'}),
+    ])
+    def test_columnar_combination_rejected(self, _, options):
+        """Test that columnar is refused where it would be ignored."""
+        with self.assertRaises(ValueError):
+            batch_query.batch_processing(5, columnar=True, **options)
+
+
+class TestResumable(UserDataTestCase):
+    """Test cases for crash and resume of process_batches_resumable."""
+
+    def setUp(self):
+        """Adds a checkpoint path and a crash switch to the fixture."""
+        super().setUp()
+        self.checkpoint = os.path.join(self.tmp.name, 'checkpoint.json')
+        self.calls = []
+
+    def _crash_saving(self, number):
+        save = batch_query.save_checkpoint
+
+        def crashing(path, checkpoint):
+            if checkpoint['batches'] == number:
+                raise KeyboardInterrupt("crash")
+            save(path, checkpoint)
+        return mock.patch.object(batch_query, 'save_checkpoint', crashing)
+
+    def _run(self, handler=None, **options):
+        return batch_query.process_batches_resumable(
+            5, handler or (lambda batch, number: self.calls.append(number)),
+            self.checkpoint, **options)
+
+    def test_crash_replays_one_batch(self):
+        """Test that a crash before the save replays just that batch."""
+        with self._crash_saving(2), self.assertRaises(KeyboardInterrupt):
+            self._run()
+        checkpoint = self._run()
+        self.assertEqual(self.calls, [1, 2, 2, 3])
+        self.assertEqual((checkpoint['batches'], checkpoint['rows']),
+                         (3, 12))
+
+    def test_into_commits_with_checkpoint(self):
+        """Test that with `into` every batch's writes land exactly once."""
+        into = seed.connect_sqlite(os.path.join(self.tmp.name, 'out.db'))
+        self.addCleanup(into.close)
+        into.execute("CREATE TABLE out (user_id TEXT, batch INTEGER)")
+        fail = {2}
+
+        def handler(batch, number, conn):
+            self.calls.append(number)
+            conn.executemany("INSERT INTO out VALUES (?, ?)",
+                             [(user['user_id'], number) for user in batch])
+            if number in fail:
+                fail.discard(number)
+                raise KeyboardInterrupt("crash before commit")
+
+        with self.assertRaises(KeyboardInterrupt):
+            self._run(handler, into=into)
+        with self._crash_saving(3), self.assertRaises(KeyboardInterrupt):
+            self._run(handler, into=into)
+        self._run(handler, into=into)
+        self.assertEqual(self.calls, [1, 2, 2, 3])
+        rows = into.execute(
+            "SELECT user_id, batch FROM out ORDER BY user_id").fetchall()
+        self.assertEqual(rows, [(f"id-{n:02d}", n // 5 + 1)
+                                for n in range(12)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Unit tests for parallel_scan.py module.
+Covers streaming range batches back as they arrive.
+"""
+
+import functools
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+import parallel_scan
+import seed
+import synthetic
+
+
+class TestParallelBatches(unittest.TestCase):
+    """Test cases for parallel_batches."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Loads 2000 synthetic users into a SQLite stand-in."""
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, 'users.db')
+        connection = seed.connect_sqlite(path)
+        seed.create_table(connection)
+        seed.insert_rows_bulk(connection,
+                              synthetic.generate_users(2000, chunk_size=500))
+        cls.ids = [row[0] for row in connection.execute(
+            "SELECT user_id FROM user_data WHERE age > 25 ORDER BY user_id")]
+        connection.close()
+        cls.connect = functools.partial(seed.connect_sqlite, path)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Removes the database."""
+        cls.tmp.cleanup()
+
+    def _batches(self, **options):
+        return parallel_scan.parallel_batches(
+            partitions=3, batch_size=50, prefetch=2, connect=self.connect,
+            **options)
+
+    def test_every_row_once(self):
+        """Test that every matching row arrives exactly once."""
+        batches = list(self._batches(where="age > %s", params=(25,)))
+        self.assertTrue(all(len(batch) <= 50 for batch in batches))
+        self.assertEqual(sorted(row['user_id'] for batch in batches
+                                for row in batch), self.ids)
+
+    def test_close_stops_workers(self):
+        """Test that abandoning the stream early ends every worker."""
+        stream = self._batches()
+        next(stream)
+        stream.close()
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_worker_error_raised(self):
+        """Test that a failing range scan raises in the driver."""
+        with self.assertRaises(RuntimeError):
+            list(self._batches(where="missing > %s", params=(1,)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Unit tests for pipeline.py module.
+Covers fused map/filter/take stages, batch/window buffering and flushing.
+"""
+
+import unittest
+from parameterized import parameterized
+
+from pipeline import Pipeline
+
+
+class TestFusedStages(unittest.TestCase):
+    """Test cases for runs of map/filter/take stages."""
+
+    def test_map_filter_take(self):
+        """Test that fused stages apply in order and stop at take."""
+        pipeline = (Pipeline(range(100))
+                    .filter(lambda n: n % 2)
+                    .map(lambda n: n * 10)
+                    .take(3))
+        self.assertEqual(list(pipeline), [10, 30, 50])
+
+    def test_take_stops_pulling(self):
+        """Test that a satisfied take stops reading and closes the source."""
+        pulled = []
+
+        def source():
+            for n in range(100):
+                pulled.append(n)
+                yield n
+
+        self.assertEqual(Pipeline(source()).take(3).collect(), [0, 1, 2])
+        self.assertEqual(pulled, [0, 1, 2])
+
+    def test_stats(self):
+        """Test that stats() counts rows in and out per stage."""
+        pipeline = Pipeline(range(10)).filter(lambda n: n < 4, 'small') \
+            .batch(3, 'chunks')
+        list(pipeline)
+        stats = {stage['name']: stage for stage in pipeline.stats()}
+        self.assertEqual((stats['small']['rows_in'],
+                          stats['small']['rows_out']), (10, 4))
+        self.assertEqual((stats['chunks']['rows_in'],
+                          stats['chunks']['rows_out']), (4, 2))
+
+
+class TestBuffering(unittest.TestCase):
+    """Test cases for batch and window stages and their final flush."""
+
+    @parameterized.expand([
+        ("plain", Pipeline(range(5)).batch(2), [[0, 1], [2, 3], [4]]),
+        ("take_then_batch", Pipeline(range(10)).take(5).batch(2),
+         [[0, 1], [2, 3], [4]]),
+        ("batch_then_take", Pipeline(range(10)).batch(3).take(2),
+         [[0, 1, 2], [3, 4, 5]]),
+        ("batch_take_batch", Pipeline(range(20)).batch(2).take(1).batch(5),
+         [[[0, 1]]]),
+        ("filter_take_batch",
+         Pipeline(range(100)).filter(lambda n: n % 3 == 0).take(4).batch(3),
+         [[0, 3, 6], [9]]),
+    ])
+    def test_iter_flushes_partial_batches(self, _, pipeline, expected):
+        """Test that iterating keeps the last partial batch."""
+        self.assertEqual(list(pipeline), expected)
+
+    def test_reduce_flushes_partial_batches(self):
+        """Test that reduce() sees the batch left when take runs out."""
+        total = Pipeline(range(10)).take(5).batch(2) \
+            .reduce(lambda acc, batch: acc + batch, [])
+        self.assertEqual(total, [0, 1, 2, 3, 4])
+
+    def test_window(self):
+        """Test that windows slide by `step` and are not flushed partial."""
+        self.assertEqual(list(Pipeline(range(6)).window(3, 2)),
+                         [(0, 1, 2), (2, 3, 4)])
+
+    def test_reduce_empty(self):
+        """Test that reducing nothing without an initial value raises."""
+        with self.assertRaises(TypeError):
+            Pipeline([]).reduce(lambda a, b: a + b)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Unit tests for pool.py module.
+Covers connection reuse and recovery from failed connects.
+"""
+
+import sqlite3
+import unittest
+
+from pool import ConnectionPool
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test cases for ConnectionPool checkout and return."""
+
+    def test_connections_are_reused(self):
+        """Test that a returned connection serves the next checkout."""
+        pool = ConnectionPool(connect=lambda: sqlite3.connect(':memory:'),
+                              size=1)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(pool.stats()['hits'], 1)
+
+    def test_failed_connect_frees_slot(self):
+        """Test that connects which raise do not use up the pool."""
+        failures = [sqlite3.OperationalError("unable to open")] * 2
+
+        def connect():
+            if failures:
+                raise failures.pop()
+            return sqlite3.connect(':memory:')
+
+        pool = ConnectionPool(connect=connect, size=1, timeout=0.05)
+        for _ in range(2):
+            with self.assertRaises(sqlite3.OperationalError):
+                pool.acquire()
+        self.assertEqual(pool.stats()['open'], 0)
+        with pool.connection() as connection:
+            self.assertEqual(connection.execute("SELECT 1").fetchone(), (1,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Unit tests for prefetch.py module.
+Covers the read-ahead bounds and closing the source on early exit.
+"""
+
+import functools
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import pool
+import seed
+from prefetch import read_ahead
+
+stream_users = __import__('0-stream_users').stream_users
+
+
+def _settled(produced, timeout=1.0):
+    """Length of `produced` once the worker stops adding to it"""
+    deadline = time.monotonic() + timeout
+    count = -1
+    while count != len(produced) and time.monotonic() < deadline:
+        count = len(produced)
+        time.sleep(0.05)
+    return len(produced)
+
+
+class TestReadAhead(unittest.TestCase):
+    """Test cases for read_ahead buffering."""
+
+    def _source(self, items):
+        self.produced = []
+        for item in items:
+            self.produced.append(item)
+            yield item
+
+    def test_depth_bounds_items_ahead(self):
+        """Test that the worker runs at most `depth` items ahead."""
+        items = read_ahead(self._source(range(20)), depth=3)
+        self.assertEqual(next(items), 0)
+        # 3 queued, plus the one pulled that is waiting for room
+        self.assertEqual(_settled(self.produced), 1 + 3 + 1)
+        self.assertEqual(list(items), list(range(1, 20)))
+
+    def test_max_bytes_bounds_items_ahead(self):
+        """Test that queued items stay within `max_bytes`."""
+        items = read_ahead(self._source([4] * 20), depth=10, max_bytes=10,
+                           sizeof=lambda item: item)
+        self.assertEqual(next(items), 4)
+        # Two items of 4 fit in 10 bytes, the third waits for room
+        self.assertEqual(_settled(self.produced), 1 + 2 + 1)
+        self.assertEqual(len(list(items)), 19)
+
+    def test_oversized_item_still_yielded(self):
+        """Test that a single item over `max_bytes` is not stuck."""
+        items = read_ahead(iter([[(1,)] * 100, [(2,)]]), max_bytes=1)
+        self.assertEqual([len(item) for item in items], [100, 1])
+
+    def test_error_reaches_consumer(self):
+        """Test that an error in the source is raised to the consumer."""
+        def failing():
+            yield 1
+            raise ValueError("boom")
+
+        items = read_ahead(failing())
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ValueError):
+            next(items)
+
+    def test_invalid_depth(self):
+        """Test that depth below 1 is rejected."""
+        with self.assertRaises(ValueError):
+            next(read_ahead(iter([1]), depth=0))
+
+
+class TestReadAheadPool(unittest.TestCase):
+    """Test cases for read_ahead over a generator holding a connection."""
+
+    def setUp(self):
+        """Creates 50 users behind a single-connection pool."""
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, 'users.db')
+        connection = seed.connect_sqlite(path)
+        seed.create_table(connection)
+        connection.executemany(
+            "INSERT INTO user_data (user_id, name, email, age) "
+            "VALUES (?, ?, ?, ?)",
+            [(f"id-{n:02d}", f"User {n}", f"user{n}@example.com", 20 + n)
+             for n in range(50)])
+        connection.commit()
+        connection.close()
+        pool.configure(connect=functools.partial(seed.connect_sqlite, path),
+                       size=1, timeout=1)
+
+    def tearDown(self):
+        """Closes the pool and removes the database."""
+        pool.get_pool().close()
+        self.tmp.cleanup()
+
+    def test_early_close_returns_connection(self):
+        """Test that stopping early returns the source's connection."""
+        users = read_ahead(stream_users(arraysize=5), depth=2)
+        self.assertEqual(next(users)['user_id'], 'id-00')
+        self.assertEqual(pool.get_pool().stats()['in_use'], 1)
+        users.close()
+        self.assertEqual(pool.get_pool().stats()['in_use'], 0)
+        self.assertFalse(any(thread.name == 'read-ahead'
+                             for thread in threading.enumerate()))
+        # The only connection is free again
+        with pool.connection() as connection:
+            self.assertIsNotNone(connection)
+
+    def test_full_scan(self):
+        """Test that a prefetched scan yields every row once."""
+        users = [user['user_id']
+                 for user in read_ahead(stream_users(arraysize=7), depth=2)]
+        self.assertEqual(users, [f"id-{n:02d}" for n in range(50)])
+        self.assertEqual(pool.get_pool().stats()['in_use'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
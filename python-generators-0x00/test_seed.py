@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Unit tests for seed.py module.
+Covers idempotent incremental re-seeding from CSV.
+"""
+
+import os
+import tempfile
+import unittest
+
+import seed
+
+
+class TestInsertDataIncremental(unittest.TestCase):
+    """Test cases for insert_data_incremental."""
+
+    def setUp(self):
+        """Creates an empty SQLite user_data table and a CSV path."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.connection = seed.connect_sqlite(
+            os.path.join(self.tmp.name, 'users.db'))
+        seed.create_table(self.connection)
+        self.csv = os.path.join(self.tmp.name, 'user_data.csv')
+
+    def tearDown(self):
+        """Closes and removes the database and CSV."""
+        self.connection.close()
+        self.tmp.cleanup()
+
+    def _write_csv(self, rows):
+        with open(self.csv, 'w') as f:
+            f.write('"name","email","age"\n')
+            for name, email, age in rows:
+                f.write(f'"{name}","{email}","{age}"\n')
+
+    def _stored(self):
+        return self.connection.execute(
+            "SELECT name, email, age FROM user_data ORDER BY email"
+        ).fetchall()
+
+    def test_rerun_changes_nothing(self):
+        """Test that repeats across chunks resolve to the last row, once."""
+        self._write_csv([
+            ('Ada', 'ada@example.com', 30),
+            ('Alan', 'alan@example.com', 40),
+            ('Grace', 'grace@example.com', 50),
+            ('Ada B', 'ADA@example.com', 31),
+            ('Alan T', 'alan@example.com', 41),
+        ])
+        first = seed.insert_data_incremental(self.connection, self.csv,
+                                             chunk_size=2)
+        self.assertEqual(first, {'inserted': 3, 'updated': 0, 'skipped': 2})
+        self.assertEqual(self._stored(), [
+            ('Ada B', 'ADA@example.com', 31),
+            ('Alan T', 'alan@example.com', 41),
+            ('Grace', 'grace@example.com', 50),
+        ])
+        second = seed.insert_data_incremental(self.connection, self.csv,
+                                              chunk_size=2)
+        self.assertEqual(second, {'inserted': 0, 'updated': 0, 'skipped': 5})
+
+    def test_changed_rows_updated(self):
+        """Test that only rows whose values changed are updated."""
+        self._write_csv([('Ada', 'ada@example.com', 30),
+                         ('Alan', 'alan@example.com', 40)])
+        seed.insert_data_incremental(self.connection, self.csv)
+        self._write_csv([('Ada', 'ada@example.com', 30),
+                         ('Alan', 'alan@example.com', 41),
+                         ('Grace', 'grace@example.com', 50)])
+        counts = seed.insert_data_incremental(self.connection, self.csv)
+        self.assertEqual(counts, {'inserted': 1, 'updated': 1, 'skipped': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
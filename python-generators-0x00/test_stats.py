@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Unit tests for stats.py module.
+Covers merged moments and t-digest quantile error against exact ranks.
+"""
+
+import bisect
+import random
+import statistics
+import unittest
+from parameterized import parameterized
+
+from stats import StreamingStats, TDigest
+
+QUANTILES = (0.001, 0.01, 0.1, 0.5, 0.9, 0.99, 0.999)
+
+
+def _values(count=100000, seed=7):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(0, 1) for _ in range(count)]
+
+
+def _rank(ordered, value):
+    """Fraction of `ordered` below value, ties counted half"""
+    low = bisect.bisect_left(ordered, value)
+    high = bisect.bisect_right(ordered, value)
+    return (low + high) / 2 / len(ordered)
+
+
+def _merged(values, cls, size=1000):
+    total = cls()
+    for start in range(0, len(values), size):
+        part = cls()
+        part.update(values[start:start + size])
+        total.merge(part)
+    return total
+
+
+class TestTDigest(unittest.TestCase):
+    """Test cases for TDigest quantiles, single and merged."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Builds one digest over a skewed sample and one from 100 parts."""
+        cls.values = _values()
+        cls.ordered = sorted(cls.values)
+        cls.single = TDigest()
+        cls.single.update(cls.values)
+        cls.merged = _merged(cls.values, TDigest)
+
+    @parameterized.expand([(q,) for q in QUANTILES])
+    def test_rank_error(self, q):
+        """Test that estimates land within 0.2% of the exact rank."""
+        for digest in (self.single, self.merged):
+            self.assertLess(abs(_rank(self.ordered, digest.quantile(q)) - q),
+                            0.002)
+
+    @parameterized.expand([(q,) for q in QUANTILES])
+    def test_merge_matches_single(self, q):
+        """Test that merging partial digests costs no extra accuracy."""
+        exact = self.ordered[int(q * (len(self.ordered) - 1))]
+        single = abs(self.single.quantile(q) - exact)
+        merged = abs(self.merged.quantile(q) - exact)
+        self.assertLessEqual(merged, max(2 * single, 0.01 * exact))
+
+    def test_extremes_exact(self):
+        """Test that q=0 and q=1 give the exact min and max."""
+        for digest in (self.single, self.merged):
+            self.assertEqual(digest.quantile(0), self.ordered[0])
+            self.assertEqual(digest.quantile(1), self.ordered[-1])
+
+    def test_bounded_size(self):
+        """Test that the sketch stays near `compression` centroids."""
+        self.single.quantile(0.5)
+        self.merged.quantile(0.5)
+        self.assertLess(len(self.single._centroids), 100)
+        self.assertLess(len(self.merged._centroids), 100)
+
+    def test_empty(self):
+        """Test that an empty digest, merged or not, has no quantiles."""
+        digest = TDigest().merge(TDigest())
+        self.assertIsNone(digest.quantile(0.5))
+        self.assertEqual(digest.count, 0)
+
+
+class TestStreamingStats(unittest.TestCase):
+    """Test cases for StreamingStats moments and merging."""
+
+    def test_merge_matches_single_pass(self):
+        """Test that merged partials give the single-pass moments."""
+        values = _values(20000)
+        merged = _merged(values, StreamingStats, size=777)
+        self.assertEqual(merged.count, len(values))
+        self.assertAlmostEqual(merged.mean, statistics.fmean(values))
+        self.assertAlmostEqual(merged.variance, statistics.pvariance(values))
+        self.assertEqual((merged.min, merged.max), (min(values), max(values)))
+
+    def test_merge_empty(self):
+        """Test that merging an empty partial changes nothing."""
+        stats = StreamingStats().update([1, 2, 3])
+        stats.merge(StreamingStats())
+        self.assertEqual((stats.count, stats.mean), (3, 2.0))
+        self.assertEqual(stats.percentile(0), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Unit tests for 0-stream_users.py module.
+Covers watermark polling and the commit safety lag of stream_user_changes.
+"""
+
+import functools
+import os
+import tempfile
+import unittest
+
+import pool
+import seed
+
+stream_users = __import__('0-stream_users')
+
+
+class TestStreamUserChanges(unittest.TestCase):
+    """Test cases for stream_user_changes."""
+
+    def setUp(self):
+        """Creates a SQLite user_data table with an old and a fresh row."""
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, 'users.db')
+        self.connection = seed.connect_sqlite(path)
+        seed.create_table(self.connection)
+        self.connection.executemany(
+            "INSERT INTO user_data (user_id, name, email, age) "
+            "VALUES (?, ?, ?, ?)",
+            [('a', 'Ada', 'ada@example.com', 30),
+             ('b', 'Alan', 'alan@example.com', 40)])
+        self.connection.execute(
+            "UPDATE user_data SET updated_at = '2020-01-01 00:00:00.000' "
+            "WHERE user_id = 'a'")
+        self.connection.commit()
+        pool.configure(connect=functools.partial(seed.connect_sqlite, path),
+                       size=1)
+
+    def tearDown(self):
+        """Closes the pool and removes the database."""
+        pool.get_pool().close()
+        self.connection.close()
+        self.tmp.cleanup()
+
+    def _ids(self, **kwargs):
+        return [row['user_id'] for row, _ in
+                stream_users.stream_user_changes(**kwargs)]
+
+    def test_recent_rows_held_back(self):
+        """Test that rows stamped within the lag wait for a later poll."""
+        self.assertEqual(self._ids(lag=60), ['a'])
+        self.assertEqual(self._ids(lag=0), ['a', 'b'])
+
+    def test_resumes_after_watermark(self):
+        """Test that passing the last watermark skips rows already seen."""
+        (_, watermark), = stream_users.stream_user_changes(lag=60)
+        self.assertEqual(self._ids(since=watermark, lag=60), [])
+        self.assertEqual(self._ids(since=watermark, lag=0), ['b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Unit tests for synthetic.py module.
+Covers unique emails and reproducible output.
+"""
+
+import unittest
+
+import seed
+import synthetic
+
+
+def _rows(count, chunk_size=1000):
+    return [row for chunk in synthetic.generate_users(count,
+                                                      chunk_size=chunk_size)
+            for row in chunk]
+
+
+class TestGenerateUsers(unittest.TestCase):
+    """Test cases for generate_users."""
+
+    def test_emails_unique(self):
+        """Test that no two rows share an email, ignoring case."""
+        emails = {seed.normalize_email(row[2]) for row in _rows(50000)}
+        self.assertEqual(len(emails), 50000)
+
+    def test_prefix_independent_of_count(self):
+        """Test that the first rows do not depend on the total count."""
+        self.assertEqual(_rows(2500)[:1234], _rows(1234))
+
+
+if __name__ == '__main__':
+    unittest.main()
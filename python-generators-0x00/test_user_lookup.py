@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Unit tests for user_lookup.py module.
+Covers case-insensitive email lookups and Bloom-filtered existence checks.
+"""
+
+import os
+import tempfile
+import unittest
+from functools import partial
+
+import pool
+import seed
+import user_lookup
+
+USERS = [
+    ('00000000-0000-0000-0000-000000000001', 'Ada Byron',
+     'Ada.Byron@Example.com', 36),
+    ('00000000-0000-0000-0000-000000000002', 'Alan Turing',
+     'alan.turing@example.com', 41),
+]
+
+
+class TestEmailLookup(unittest.TestCase):
+    """Test cases for get_user_by_email and emails_exist."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Builds a SQLite user_data table and points the pool at it."""
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, 'users.db')
+        connection = seed.connect_sqlite(path)
+        seed.create_table(connection)
+        connection.executemany(
+            "INSERT INTO user_data (user_id, name, email, age) "
+            "VALUES (?, ?, ?, ?)", USERS)
+        connection.commit()
+        connection.close()
+        pool.configure(connect=partial(seed.connect_sqlite, path), size=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Closes the pool and removes the database."""
+        pool.get_pool().close()
+        cls.tmp.cleanup()
+
+    def test_get_user_by_email_ignores_case(self):
+        """Test that lookups match whatever case the email is given in."""
+        for email in ('ada.byron@example.com', 'ADA.BYRON@EXAMPLE.COM',
+                      ' Ada.Byron@Example.com '):
+            user = user_lookup.get_user_by_email(email)
+            self.assertIsNotNone(user, email)
+            self.assertEqual(user['user_id'], USERS[0][0])
+        self.assertIsNone(user_lookup.get_user_by_email('nobody@example.com'))
+
+    def test_emails_exist_mixed_case(self):
+        """Test that emails_exist returns the given spellings that exist."""
+        emails = ['ada.byron@example.com', 'Alan.Turing@Example.COM',
+                  'ADA.BYRON@EXAMPLE.COM', 'grace@example.com']
+        expected = set(emails[:3])
+        self.assertEqual(user_lookup.emails_exist(emails), expected)
+
+    def test_emails_exist_with_bloom(self):
+        """Test that the Bloom filter gives no false negatives on case."""
+        bloom = user_lookup.build_email_bloom()
+        emails = ['Ada.Byron@Example.com', 'alan.turing@EXAMPLE.com',
+                  'grace@example.com']
+        self.assertEqual(user_lookup.emails_exist(emails, bloom=bloom),
+                         set(emails[:2]))
+
+    def test_email_key_is_indexed(self):
+        """Test that the normalized email lookup uses the index."""
+        with pool.connection() as connection:
+            plan = connection.execute(
+                "EXPLAIN QUERY PLAN SELECT user_id FROM user_data "
+                f"WHERE {seed.EMAIL_KEY} = ?", ('x',)).fetchall()
+        self.assertIn('idx_user_data_email_key', str(plan))
+
+
+if __name__ == '__main__':
+    unittest.main()
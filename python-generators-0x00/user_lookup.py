@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+"""Email lookups on user_data.
+
+Emails match case-insensitively: lookups compare seed.normalize_email
+of the argument with seed.EMAIL_KEY, which seed.add_email_index indexes.
+build_email_bloom streams every stored email, normalized the same way,
+into a BloomFilter so bulk existence checks (e.g. during ingest) only
+query the database for emails the filter cannot rule out.
+"""
+import pool
+import seed
+from bloom import BloomFilter
+
+
+def get_user_by_email(email):
+    """Returns the user row for email (any case), or None"""
+    with pool.connection() as connection:
+        cursor = seed.open_cursor(connection)
+        cursor.execute(
+            "SELECT user_id, name, email, age FROM user_data "
+            f"WHERE {seed.EMAIL_KEY} = {seed.placeholder(connection)} "
+            "LIMIT 1", (seed.normalize_email(email),))
+        user = cursor.fetchone()
+        cursor.close()
+    return user
+
+
+def emails_exist(emails, bloom=None, chunk_size=500):
+    """Returns the subset of emails already stored in user_data
+
+    Matching ignores case and surrounding whitespace. Emails the Bloom
+    filter (from build_email_bloom) rules out are never sent to the
+    database; the rest are checked with one indexed IN (...) query per
+    chunk.
+    """
+    by_key = {}
+    for email in emails:
+        by_key.setdefault(seed.normalize_email(email), []).append(email)
+    candidates = [key for key in by_key if bloom is None or key in bloom]
+    found = set()
+    if not candidates:
+        return found
+    with pool.connection() as connection:
+        mark = seed.placeholder(connection)
+        cursor = seed.open_cursor(connection, dictionary=False)
+        for start in range(0, len(candidates), chunk_size):
+            chunk = candidates[start:start + chunk_size]
+            marks = ', '.join([mark] * len(chunk))
+            cursor.execute(
+                f"SELECT {seed.EMAIL_KEY} FROM user_data "
+                f"WHERE {seed.EMAIL_KEY} IN ({marks})", tuple(chunk))
+            for (key,) in cursor.fetchall():
+                found.update(by_key.get(key, ()))
+        cursor.close()
+    return found
+
+
+def build_email_bloom(capacity=None, error_rate=0.01, arraysize=10000):
+    """Streams every stored email, normalized, into a new BloomFilter
+
+    capacity defaults to twice the current row count, leaving room for
+    emails added to the filter during later ingest.
+    """
+    with pool.connection() as connection:
+        cursor = seed.open_cursor(connection, dictionary=False)
+        if capacity is None:
+            cursor.execute("SELECT COUNT(*) FROM user_data")
+            capacity = 2 * cursor.fetchone()[0]
+        bloom = BloomFilter(capacity, error_rate)
+        cursor.execute("SELECT email FROM user_data")
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                break
+            for (email,) in rows:
+                bloom.add(seed.normalize_email(email))
+        cursor.close()
+    return bloom